@@ -0,0 +1,3 @@
+"""
+Benchmarks for the hot paths of the bot, run them as modules from the repository root.
+"""
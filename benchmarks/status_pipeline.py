@@ -0,0 +1,230 @@
+"""
+Benchmarks the /status pipeline: parsing a TF2 `status` dump, then enriching it with
+Steam profiles and SteamHistory bans.
+
+Enrichment runs against a local mock of the Steam Web API and SteamHistory, so the
+numbers only depend on the code and the configured latency. Run it from the repository root:
+
+    python -m benchmarks.status_pipeline --sizes 12 24 32 64 100 --latency 50
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+from aiohttp import web
+
+from utils.http import RateLimiter, create_http_session
+from utils.steam import SteamAPI
+from utils.tf2_status import StatusResult, parse_status
+
+HOSTNAMES = [
+    "Valve Matchmaking Server (Virginia srcds1001-iad1 #55)",
+    "Skial | 2Fort 24/7 | Fast Respawn #1",
+    "UGC: 6v6 Scrim :: Server #2",
+    "★ Uncletopia | Chicago | 2 ★",
+    "\"quoted\" hostname: with # and : in it",
+]
+MAPS = ["pl_badwater", "ctf_2fort", "cp_process_final", "koth_product_final", "pl_upward"]
+NAMES = ["Heavy", "Scout", "a \"quoted\" name", "#hashtag", "   spaced   ", "ユーザー", "[TAG] Player", "x" * 32]
+
+
+def generate_status(humans: int, rng: random.Random, *, bots: int = 1, legacy_ratio: float = 0.1) -> str:
+    """
+    Generates the output of `status` for a lobby with the given amount of human players.
+
+    Some players use legacy STEAM_0 IDs, some are still connecting (spectators without
+    stats yet), and SourceTV plus the requested amount of bots are listed as BOT.
+    """
+    lines = [
+        f"hostname: {rng.choice(HOSTNAMES)}",
+        "version : 8622567/24 8622567 secure",
+        "udp/ip  : 169.254.117.4:38611  (public ip: 162.254.192.72)",
+        "steamid : [G:1:1234567] (90123456789012345)",
+        "account : not logged in  (No account specified)",
+        f"map     : {rng.choice(MAPS)} at: 0 x, 0 y, 0 z",
+        "tags    : cp,increased_maxplayers,payload,valve",
+        f"players : {humans} humans, {bots} bots ({max(24, humans + bots)} max)",
+        "edicts  : 1117 used of 2048 max",
+        "# userid name                uniqueid            connected ping loss state",
+    ]
+    userid = 100
+    for _ in range(bots):
+        userid += 1
+        lines.append(f'#    {userid} "Bot{userid:02}"          BOT                       active')
+    for index in range(humans):
+        userid += 1
+        account_id = rng.randrange(1, 1_500_000_000)
+        if rng.random() < legacy_ratio:
+            uniqueid = f"STEAM_0:{account_id % 2}:{account_id // 2}"
+        else:
+            uniqueid = f"[U:1:{account_id}]"
+        name = f"{rng.choice(NAMES)}{index}"
+        if rng.random() < 0.1:
+            lines.append(f'#    {userid} "{name}"  {uniqueid}  00:04  0  0 spawning')
+        else:
+            connected = f"{rng.randrange(0, 3)}:{rng.randrange(60):02}:{rng.randrange(60):02}"
+            lines.append(
+                f'#    {userid} "{name}"  {uniqueid}  {connected}  {rng.randrange(10, 250)}  {rng.randrange(0, 5)} active'
+            )
+    return "\n".join(lines)
+
+
+class MockSteamServer:
+    """
+    Serves GetPlayerSummaries and SteamHistory sourcebans on localhost with a fixed latency.
+    """
+
+    def __init__(self, latency: float, ban_ratio: float, rng: random.Random) -> None:
+        self.latency = latency
+        self.ban_ratio = ban_ratio
+        self.rng = rng
+        self.requests = 0
+        self.runner = None
+        self.port = None
+
+    async def summaries(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        await asyncio.sleep(self.latency)
+        steamids = request.query.get("steamids", "").split(",")
+        players = [
+            {
+                "steamid": steamid,
+                "personaname": f"player{steamid[-4:]}",
+                "profileurl": f"https://steamcommunity.com/profiles/{steamid}/",
+                "avatarfull": "",
+                "timecreated": 1262304000,
+                "communityvisibilitystate": 3,
+                "profilestate": 1,
+                "personastate": 0,
+            }
+            for steamid in steamids
+            if steamid
+        ]
+        return web.json_response({"response": {"players": players}})
+
+    async def sourcebans(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        await asyncio.sleep(self.latency)
+        steamids = request.query.get("steamids", "").split(",")
+        bans = [
+            {
+                "SteamID": steamid,
+                "Name": "cheater",
+                "CurrentState": "Permanent",
+                "BanReason": "Hacking",
+                "UnbanReason": None,
+                "BanTimestamp": 1685513965,
+                "UnbanTimestamp": 0,
+                "Server": "Skial",
+            }
+            for steamid in steamids
+            if steamid and self.rng.random() < self.ban_ratio
+        ]
+        return web.json_response({"response": bans})
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_get("/ISteamUser/GetPlayerSummaries/v2/", self.summaries)
+        app.router.add_get("/api/sourcebans", self.sourcebans)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        await self.runner.cleanup()
+
+
+def percentile(samples: list[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def bench_parse(dump: str, iterations: int) -> list[float]:
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        parse_status(dump)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+async def enrich(api: SteamAPI, result: StatusResult):
+    """
+    The network stage of SteamTools.scrape_status_command.
+    """
+    return await asyncio.gather(
+        api.fetch_player_summaries(result.steamids64, priority=RateLimiter.BULK),
+        api.fetch_sourcebans(result.steamids64, priority=RateLimiter.BULK),
+    )
+
+
+async def bench_enrich(server: MockSteamServer, dump: str, iterations: int, *, warm: bool) -> tuple[list[float], float]:
+    """
+    Times the enrichment of a dump.
+
+    :param warm: Reuse one client so every run after the first is served from its cache.
+    :return: The samples and the average amount of HTTP requests per run.
+    """
+    base = f"http://127.0.0.1:{server.port}"
+    # Limits high enough that the mock is never throttled, we measure the pipeline, not the limiter
+    limiter = RateLimiter({"127.0.0.1": (10_000.0, 10_000)})
+    session = create_http_session()
+    samples = []
+    requests_before = server.requests
+    result = parse_status(dump)
+    api = None
+    try:
+        for _ in range(iterations):
+            if api is None or not warm:
+                api = SteamAPI(
+                    session,
+                    player_summaries_url=f"{base}/ISteamUser/GetPlayerSummaries/v2/?",
+                    sourcebans_url=f"{base}/api/sourcebans?steamids={{steamids}}",
+                    limiter=limiter,
+                )
+            start = time.perf_counter()
+            await enrich(api, result)
+            samples.append(time.perf_counter() - start)
+    finally:
+        await session.close()
+    return samples, (server.requests - requests_before) / iterations
+
+
+async def main(args: argparse.Namespace) -> None:
+    rng = random.Random(args.seed)
+    server = MockSteamServer(args.latency / 1000, args.ban_ratio, rng)
+    await server.start()
+    print(f"mock latency {args.latency:.0f}ms, {args.iterations} iterations per size\n")
+    print(f"{'players':>7} | {'parse p50':>10} {'parse p95':>10} | {'cold p50':>9} {'cold p95':>9} {'req':>5} | {'warm p50':>9} {'warm p95':>9} {'req':>5}")
+    try:
+        for size in args.sizes:
+            dump = generate_status(size, rng, bots=rng.randrange(0, 3))
+            parse_samples = bench_parse(dump, args.iterations * 10)
+            cold_samples, cold_requests = await bench_enrich(server, dump, args.iterations, warm=False)
+            warm_samples, warm_requests = await bench_enrich(server, dump, args.iterations, warm=True)
+            print(
+                f"{size:>7} | "
+                f"{percentile(parse_samples, 0.5) * 1e6:>8.0f}us {percentile(parse_samples, 0.95) * 1e6:>8.0f}us | "
+                f"{percentile(cold_samples, 0.5) * 1e3:>7.1f}ms {percentile(cold_samples, 0.95) * 1e3:>7.1f}ms {cold_requests:>5.1f} | "
+                f"{percentile(warm_samples, 0.5) * 1e3:>7.1f}ms {percentile(warm_samples, 0.95) * 1e3:>7.1f}ms {warm_requests:>5.1f}"
+            )
+    finally:
+        await server.stop()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[12, 24, 32, 64, 100], help="Human players per dump")
+    parser.add_argument("--iterations", type=int, default=20, help="Enrichment runs per dump")
+    parser.add_argument("--latency", type=float, default=50.0, help="Mock API latency in milliseconds")
+    parser.add_argument("--ban-ratio", type=float, default=0.1, help="Share of players the mock reports bans for")
+    parser.add_argument("--seed", type=int, default=1)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
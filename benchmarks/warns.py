@@ -0,0 +1,126 @@
+"""
+Benchmarks the warns store: adding warns one by one and in bulk, concurrent warns of
+the same user, and reading back a user with thousands of warnings.
+
+Runs against a temporary database created by the migrations. Run it from the
+repository root:
+
+    python -m benchmarks.warns --warns 5000 --page-sizes 100 500 2000
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from benchmarks.status_pipeline import percentile
+from database import DatabaseManager, DatabasePool
+from database.migrations import migrate
+
+SERVER_ID = 1240320839719719025
+USER_ID = 1240624554544726037
+MODERATOR_ID = 1240320839719719000
+
+
+async def open_database(path: str, readers: int) -> DatabaseManager:
+    pool = DatabasePool(path, readers=readers, slow_query_ms=float("inf"))
+    await pool.open()
+    await migrate(pool)
+    return DatabaseManager(pool=pool)
+
+
+async def bench_add(database: DatabaseManager, count: int) -> list[float]:
+    samples = []
+    for index in range(count):
+        start = time.perf_counter()
+        await database.add_warn(USER_ID + 1, SERVER_ID, MODERATOR_ID, f"Warn {index}")
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+async def bench_concurrent_add(database: DatabaseManager, count: int) -> tuple[float, bool]:
+    """
+    Warns the same user `count` times at once.
+
+    :return: The total time and whether every warn got its own ID.
+    """
+    start = time.perf_counter()
+    warn_ids = await asyncio.gather(
+        *(database.add_warn(USER_ID + 2, SERVER_ID, MODERATOR_ID, f"Warn {index}") for index in range(count))
+    )
+    return time.perf_counter() - start, sorted(warn_ids) == list(range(1, count + 1))
+
+
+async def bench_read(database: DatabaseManager, page_size: int, iterations: int) -> tuple[list[float], list[float], int]:
+    """
+    Times reading every warning of the benchmark user.
+
+    :return: The samples for the whole read, the samples until the first row and the row count.
+    """
+    samples = []
+    first_row = []
+    rows = 0
+    for _ in range(iterations):
+        rows = 0
+        start = time.perf_counter()
+        async for _ in database.get_warnings(USER_ID, SERVER_ID, page_size=page_size):
+            if rows == 0:
+                first_row.append(time.perf_counter() - start)
+            rows += 1
+        samples.append(time.perf_counter() - start)
+    return samples, first_row, rows
+
+
+async def main(args: argparse.Namespace) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        database = await open_database(os.path.join(directory, "warns.db"), args.readers)
+        try:
+            start = time.perf_counter()
+            await database.add_warns(
+                (USER_ID, SERVER_ID, MODERATOR_ID, f"Bulk warn {index}") for index in range(args.warns)
+            )
+            bulk = time.perf_counter() - start
+            print(f"add_warns: {args.warns} warns in one transaction in {bulk * 1000:.1f}ms ({bulk / args.warns * 1e6:.0f}us per warn)")
+
+            single = await bench_add(database, args.single)
+            print(
+                f"add_warn: {args.single} warns one by one, "
+                f"p50 {percentile(single, 0.5) * 1000:.2f}ms, p95 {percentile(single, 0.95) * 1000:.2f}ms"
+            )
+
+            elapsed, unique = await bench_concurrent_add(database, args.concurrent)
+            print(
+                f"add_warn: {args.concurrent} concurrent warns of one user in {elapsed * 1000:.1f}ms, "
+                f"{'every warn got its own ID' if unique else 'DUPLICATE OR MISSING IDS'}"
+            )
+
+            print(f"\n{'page size':>9} | {'read p50':>9} {'read p95':>9} | {'first row p50':>13} | {'rows':>6}")
+            for page_size in args.page_sizes:
+                samples, first_row, rows = await bench_read(database, page_size, args.iterations)
+                print(
+                    f"{page_size:>9} | "
+                    f"{percentile(samples, 0.5) * 1000:>7.1f}ms {percentile(samples, 0.95) * 1000:>7.1f}ms | "
+                    f"{percentile(first_row, 0.5) * 1000:>11.2f}ms | {rows:>6}"
+                )
+
+            start = time.perf_counter()
+            removed = await database.clear_warns(SERVER_ID, [USER_ID, USER_ID + 1, USER_ID + 2])
+            print(f"\nclear_warns: {removed} warns of 3 users in {(time.perf_counter() - start) * 1000:.1f}ms")
+        finally:
+            await database.close()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--warns", type=int, default=5000, help="Warnings of the user that is read back")
+    parser.add_argument("--single", type=int, default=200, help="Warns added one by one")
+    parser.add_argument("--concurrent", type=int, default=100, help="Warns of one user added at the same time")
+    parser.add_argument("--page-sizes", type=int, nargs="+", default=[100, 500, 2000], help="get_warnings page sizes")
+    parser.add_argument("--iterations", type=int, default=20, help="Reads per page size")
+    parser.add_argument("--readers", type=int, default=4, help="Reader connections of the pool")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
@@ -1,24 +1,43 @@
+import asyncio
+import atexit
+import copy
 import json
 import logging
+import logging.handlers
 import os
 import platform
+import queue
 import random
 import sys
+import time
+from datetime import datetime, timezone
+
+# Installed before any third-party import so the startup log can report what each one cost
+from utils.startup import ImportTimer, TimelineEntry, build_cog_manifest, find_dependency_cycles
+
+import_timer = ImportTimer.install()
 
-import aiosqlite
 import discord
+from discord import app_commands
 from discord.ext import commands, tasks
 from discord.ext.commands import Context
+from discord.ext.commands.hybrid import HybridAppCommand
 from dotenv import load_dotenv
-from wavelink import NodeStatus
 
-from database import DatabaseManager
+from database import DatabaseManager, DatabasePool
+from database.migrations import migrate
+from utils.config import ConfigService
+from utils.http import HTTPPoolStats, RateLimiter, create_http_session
+from utils.metrics import Metrics, start_exporter
+from utils.watchdog import LoopWatchdog
 
 if not os.path.isfile(f"{os.path.realpath(os.path.dirname(__file__))}/config.json"):
     sys.exit("'config.json' not found! Please add it and try again.")
 else:
-    with open(f"{os.path.realpath(os.path.dirname(__file__))}/config.json") as file:
-        config = json.load(file)
+    # Read once here, before the event loop runs, then kept up to date by the service
+    config_service = ConfigService.load(f"{os.path.realpath(os.path.dirname(__file__))}/config.json")
+    config = config_service.snapshot
+    config_service.poll_interval = config.get("config_poll_seconds", 5)
 
 """	
 Setup bot intents (events restrictions)
@@ -67,7 +86,15 @@ intents.presences = True
 
 DATABASE_DIR = "database"
 ABS_PATH = os.path.dirname(os.path.abspath(__file__))
-DB_PATH = os.path.join(DATABASE_DIR, "database.db")
+COGS_DIR = os.path.join(ABS_PATH, "cogs")
+DB_PATH = os.path.join(ABS_PATH, DATABASE_DIR, "database.db")
+DEFAULT_PREFIX = ">"
+
+# "sharding": {"enabled": true, "shard_count": ..., "shard_ids": [...]} in the config runs one gateway
+# connection per shard. The count is asked from Discord when left out, which is only possible without
+# shard_ids. Needs a restart to change.
+SHARDING = config.get("sharding") or {}
+BotBase = commands.AutoShardedBot if SHARDING.get("enabled") else commands.Bot
 
 
 # Setup both of the loggers
@@ -91,108 +118,394 @@ class LoggingFormatter(logging.Formatter):
         logging.CRITICAL: red + bold,
     }
 
-    def format(self, record):
-        log_color = self.COLORS[record.levelno]
+    def __init__(self) -> None:
+        super().__init__()
+        # One formatter per level, built once instead of for every record
+        self.formatters = {level: self.build_formatter(color) for level, color in self.COLORS.items()}
+        self.default_formatter = self.build_formatter(self.gray)
+
+    def build_formatter(self, log_color: str) -> logging.Formatter:
         format = "(black){asctime}(reset) (levelcolor){levelname:<8}(reset) (green){name}(reset) {message}"
         format = format.replace("(black)", self.black + self.bold)
         format = format.replace("(reset)", self.reset)
         format = format.replace("(levelcolor)", log_color)
         format = format.replace("(green)", self.green + self.bold)
-        formatter = logging.Formatter(format, "%Y-%m-%d %H:%M:%S", style="{")
-        return formatter.format(record)
+        return logging.Formatter(format, "%Y-%m-%d %H:%M:%S", style="{")
+
+    def format(self, record):
+        return self.formatters.get(record.levelno, self.default_formatter).format(record)
+
+
+class JSONLinesFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queues records with their exception info instead of formatting them first, so tracebacks are
+    formatted by the listener thread and each handler's formatter still sees them.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        # Merged now, the arguments may have changed by the time the listener gets to the record
+        record.msg = record.message = record.getMessage()
+        record.args = None
+        return record
+
+
+def rotating_file_handler(filename: str, settings: dict) -> logging.Handler:
+    """
+    Creates a file handler rotating by time if `when` is set (e.g. "midnight"), by size otherwise.
+    """
+    if settings.get("when"):
+        return logging.handlers.TimedRotatingFileHandler(
+            filename, when=settings["when"], backupCount=settings.get("backups", 5), encoding="utf-8"
+        )
+    return logging.handlers.RotatingFileHandler(
+        filename,
+        maxBytes=settings.get("max_bytes", 10 * 1024 * 1024),
+        backupCount=settings.get("backups", 5),
+        encoding="utf-8",
+    )
 
 
 logger = logging.getLogger("discord_bot")
 logger.setLevel(logging.INFO)
 
+# "log_file": {"max_bytes": ..., "backups": ..., "when": ...} in the config, rotates by size by default
+log_file_settings = config.get("log_file", {})
+
 # Console handler
 console_handler = logging.StreamHandler()
 console_handler.setFormatter(LoggingFormatter())
 # File handler
-file_handler = logging.FileHandler(filename="discord.log", encoding="utf-8", mode="w")
+file_handler = rotating_file_handler(log_file_settings.get("filename", "discord.log"), log_file_settings)
 file_handler_formatter = logging.Formatter(
     "[{asctime}] [{levelname:<8}] {name}: {message}", "%Y-%m-%d %H:%M:%S", style="{"
 )
 file_handler.setFormatter(file_handler_formatter)
-
-# Add the handlers
-logger.addHandler(console_handler)
-logger.addHandler(file_handler)
-
-
-class DiscordBot(commands.Bot):
+handlers = [console_handler, file_handler]
+# Optional JSON lines output for log ingestion, "log_json": {"filename": "discord.jsonl", ...}
+json_log_settings = config.get("log_json")
+if json_log_settings:
+    json_handler = rotating_file_handler(json_log_settings.get("filename", "discord.jsonl"), json_log_settings)
+    json_handler.setFormatter(JSONLinesFormatter())
+    handlers.append(json_handler)
+
+# The handlers write from a background thread, logging only puts the record on a queue
+log_queue = queue.SimpleQueue()
+logger.addHandler(DeferredQueueHandler(log_queue))
+log_listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+log_listener.start()
+# Stopping the listener writes out whatever is still queued
+atexit.register(log_listener.stop)
+
+
+class LazyCommandTree(app_commands.CommandTree):
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        # Slash commands stay registered with Discord, so their cog may not be loaded yet
+        if interaction.type in (discord.InteractionType.application_command, discord.InteractionType.autocomplete):
+            await self.client.load_cog_for(interaction.data.get("name"))
+        if interaction.type is discord.InteractionType.application_command:
+            command = interaction.command
+            # Hybrid commands are timed by the bot's invoke hooks, like their prefix version
+            if command is not None and not isinstance(command, HybridAppCommand):
+                interaction.extras["metrics"] = self.client.metrics.start(command.qualified_name)
+        return True
+
+    async def on_error(self, interaction: discord.Interaction, error: app_commands.AppCommandError) -> None:
+        invocation = interaction.extras.pop("metrics", None)
+        if invocation is not None:
+            self.client.metrics.finish(invocation)
+        if interaction.command is not None:
+            self.client.metrics.record_error(interaction.command.qualified_name, getattr(error, "original", error))
+        await super().on_error(interaction, error)
+
+
+class DiscordBot(BotBase):
     def __init__(self) -> None:
         self.status_message = None
+        # guild_id -> prefix, kept in sync with GuildSettings by guild_prefix()
+        self.prefix_cache: dict[int, str] = {}
+        self.prefix_cache_hits = 0
+        self.prefix_cache_misses = 0
+        # IDs of guilds that already have a prefix in GuildSettings
+        self.known_guilds: set[int] = set()
 
         async def get_prefix(bot, message: discord.Message) -> list[str]:
-            async with aiosqlite.connect(DB_PATH) as db:
-                async with db.cursor() as cursor:
-                    guild_id = message.guild.id if message.guild else None
-                    if isinstance(guild_id, int) or guild_id is None:
-                        prefix = await self.guild_prefix(guild_id)
-                        return commands.when_mentioned_or(prefix)(bot, message)
-                    else:
-                        raise TypeError(f"guild_id should be of type int or None, not {type(guild_id)}")
+            # DMs have no guild prefix, they are not counted as cache misses
+            if message.guild is None:
+                return commands.when_mentioned_or(DEFAULT_PREFIX)(bot, message)
+            prefix = self.prefix_cache.get(message.guild.id)
+            if prefix is None:
+                self.prefix_cache_misses += 1
+                prefix = DEFAULT_PREFIX
+            else:
+                self.prefix_cache_hits += 1
+            return commands.when_mentioned_or(prefix)(bot, message)
+
+        shard_options = {}
+        if SHARDING.get("enabled"):
+            if SHARDING.get("shard_count") is not None:
+                shard_options["shard_count"] = SHARDING["shard_count"]
+            if SHARDING.get("shard_ids") is not None:
+                # discord.py only knows which shards are left to other processes with the total count
+                if "shard_count" not in shard_options:
+                    logger.error("Config error: sharding.shard_ids is set, so sharding.shard_count has to be set too")
+                    sys.exit("'sharding.shard_ids' needs 'sharding.shard_count' in config.json.")
+                shard_options["shard_ids"] = SHARDING["shard_ids"]
 
         super().__init__(
             command_prefix=get_prefix,
             intents=intents,
             help_command=None,
+            tree_cls=LazyCommandTree,
+            **shard_options,
         )
         self.logger = logger
-        self.config = config
+        self.config_service = config_service
         self.database = None
+        self.http_session = None
+        self.http_stats = HTTPPoolStats()
+        # host -> [requests per second, burst size], for the external APIs used by the cogs
+        self.rate_limiter = RateLimiter(self.config.get("rate_limits"))
+        self.metrics = Metrics()
+        self.watchdog = LoopWatchdog(threshold=self.config.get("loop_lag_threshold_ms", 250) / 1000)
+        self.metrics_exporter = None
+        self.http_stats.observer = self.metrics.observe_http
+        self.before_invoke(self.before_command)
+        self.after_invoke(self.after_command)
+        # With lazy_cogs, cogs are loaded on their first command or in the background after on_ready
+        self.lazy_cogs = self.config.get("lazy_cogs", False)
+        # command name -> extension, for the extensions that have not been loaded yet
+        self.pending_commands: dict[str, str] = {}
+        self.pending_extensions: set[str] = set()
+        self.extension_locks: dict[str, asyncio.Lock] = {}
+        self.background_cog_loader = None
+        self.background_tasks = set()
+        # extension -> CogManifest, read from the cog sources by register_cog_manifest()
+        self.cog_manifest = {}
+        # extension -> "loaded", "failed" or "skipped", cogs are only tried once
+        self.cog_status: dict[str, str] = {}
+        self.started_at = time.perf_counter()
+        self.startup_timeline: list[TimelineEntry] = []
+        self.config_service.subscribe(self.on_config_change)
+
+    @property
+    def config(self):
+        """
+        The current config snapshot, read-only. Swapped as a whole when config.json changes.
+        """
+        return self.config_service.snapshot
 
-    async def guild_prefix(db, guild_id, prefix=None):
-        async with aiosqlite.connect(DB_PATH) as conn:
-            c = await conn.cursor()
-            if prefix is not None:
-                # Write to the table
-                await c.execute("UPDATE GuildSettings SET prefix = ? WHERE guild_id = ?", (prefix, guild_id))
-                await conn.commit()
-            else:
-                # Read from the table
-                await c.execute("SELECT prefix FROM GuildSettings WHERE guild_id = ?", (guild_id,))
-                row = await c.fetchone()
-                return row[0] if row else None
-
-    async def guild_autoroles(db, guild_id, role_id=None):
-        async with aiosqlite.connect(DB_PATH) as db_conn:
-            db = await db_conn.cursor()
-            if role_id is not None:
-                # Write to the table
-                await db.execute("UPDATE GuildSettings SET autorole_id = ? WHERE guild_id = ?", (role_id, guild_id))
-                await db_conn.commit()
-            else:
-                # Read from the table
-                await db.execute("SELECT autorole_id FROM GuildSettings WHERE guild_id = ?", (guild_id,))
-                row = await db.fetchone()
-                return row[0] if row else None
+    def on_config_change(self, previous, current) -> None:
+        """
+        Applies the settings that can change without a restart.
+        """
+        self.watchdog.threshold = current.get("loop_lag_threshold_ms", 250) / 1000
+        if self.database is not None:
+            self.database.pool.stats.slow_threshold = current.get("slow_query_ms", 100) / 1000
+        self.config_service.poll_interval = current.get("config_poll_seconds", 5)
+        changed = sorted(key for key in previous.keys() | current.keys() if previous.get(key) != current.get(key))
+        if changed:
+            self.logger.info(f"Config changed: {', '.join(changed)}")
+
+    async def guild_prefix(self, guild_id, prefix=None):
+        if prefix is not None:
+            # Write to the table, then to the cache so get_prefix never goes stale
+            await self.database.set_guild_prefix(guild_id, prefix)
+            self.prefix_cache[guild_id] = prefix
+            return prefix
+
+        cached = self.prefix_cache.get(guild_id)
+        if cached is not None:
+            self.prefix_cache_hits += 1
+            return cached
+        self.prefix_cache_misses += 1
+        # Read from the table
+        prefix = await self.database.get_guild_prefix(guild_id)
+        if prefix is not None:
+            self.prefix_cache[guild_id] = prefix
+        return prefix
+
+    async def warm_prefix_cache(self) -> None:
+        """
+        Loads every guild prefix from GuildSettings into the in-memory cache.
+        """
+        rows = await self.database.get_guild_prefixes()
+        self.prefix_cache = {guild_id: prefix for guild_id, prefix in rows}
+        self.known_guilds = set(self.prefix_cache)
+        self.logger.info(f"Loaded {len(self.prefix_cache)} guild prefixes into the cache")
+
+    async def guild_autoroles(self, guild_id, role_id=None):
+        if role_id is not None:
+            # Write to the table
+            await self.database.set_guild_autorole(guild_id, role_id)
+        else:
+            # Read from the table
+            return await self.database.get_guild_autorole(guild_id)
 
     async def init_db(self) -> None:
-        async with aiosqlite.connect(
-                f"{os.path.realpath(os.path.dirname(__file__))}/database/database.db"
-        ) as db:
-            with open(
-                    f"{os.path.realpath(os.path.dirname(__file__))}/database/schema.sql") as file:
-                await db.executescript(file.read())
-            await db.commit()
+        # A single PRAGMA read when the database is already up to date
+        start = time.perf_counter()
+        applied = await migrate(self.database.pool)
+        if applied:
+            self.logger.info(
+                f"Migrated the database to version {applied[-1].version} in {(time.perf_counter() - start) * 1000:.1f}ms"
+            )
 
     async def load_cogs(self) -> None:
         """
-        The code in this function is executed whenever the bot will start.
+        Loads every cog that has not been loaded yet, all at once. Each cog starts as soon as
+        the cogs it depends on are loaded, and a cog that fails only holds back its dependents.
+        """
+        await asyncio.gather(*(self.load_cog(extension) for extension in sorted(self.pending_extensions)))
+
+    async def load_cog(self, extension: str, *, retry: bool = False) -> bool:
+        """
+        Loads a cog and its dependencies once, whether it is asked for by the startup, a command
+        or the background loader, then starts its warm-up.
+
+        :param extension: The file name of the cog, without `.py`.
+        :param retry: Whether to try again if the cog failed or was skipped before, for the load command.
+        :return: Whether the cog is loaded.
+        """
+        lock = self.extension_locks.setdefault(extension, asyncio.Lock())
+        async with lock:
+            status = self.cog_status.get(extension)
+            if status is not None and not (retry and status != "loaded"):
+                return status == "loaded"
+            self.pending_extensions.discard(extension)
+            self.pending_commands = {
+                name: pending for name, pending in self.pending_commands.items() if pending != extension
+            }
+            manifest = self.cog_manifest.get(extension)
+            dependencies = manifest.dependencies if manifest is not None else []
+            loaded = await asyncio.gather(*(self.load_cog(dependency, retry=retry) for dependency in dependencies))
+            start = self.startup_clock()
+            if not all(loaded):
+                missing = ", ".join(dependency for dependency, ok in zip(dependencies, loaded) if not ok)
+                self.record_cog(extension, start, "skipped")
+                self.logger.error(f"Skipped extension {extension}, its dependencies failed to load: {missing}")
+                return False
+            try:
+                await self.load_extension(f"cogs.{extension}")
+            except Exception as e:
+                self.record_cog(extension, start, "failed")
+                exception = f"{type(e).__name__}: {e}"
+                self.logger.error(
+                    f"Failed to load extension {extension}\n{exception}"
+                )
+                return False
+            entry = self.record_cog(extension, start, "loaded")
+            self.logger.info(f"Loaded extension '{extension}' in {entry.duration:.1f}ms")
+        self.start_warm_up(extension)
+        return True
+
+    async def unload_cog(self, extension: str) -> None:
+        """
+        Unloads a cog, it can be loaded again with load_cog.
+        """
+        async with self.extension_locks.setdefault(extension, asyncio.Lock()):
+            await self.unload_extension(f"cogs.{extension}")
+            self.cog_status.pop(extension, None)
+        self.logger.info(f"Unloaded extension '{extension}'")
+
+    async def reload_cog(self, extension: str) -> None:
+        """
+        Reloads a loaded cog and warms up the new instance.
+        """
+        async with self.extension_locks.setdefault(extension, asyncio.Lock()):
+            start = self.startup_clock()
+            await self.reload_extension(f"cogs.{extension}")
+            entry = self.record_cog(extension, start, "loaded")
+        self.logger.info(f"Reloaded extension '{extension}' in {entry.duration:.1f}ms")
+        self.start_warm_up(extension)
+
+    def start_warm_up(self, extension: str) -> None:
+        for cog in self.cogs.values():
+            if type(cog).__module__ == f"cogs.{extension}" and hasattr(cog, "warm_up"):
+                task = asyncio.create_task(self.warm_up_cog(extension, cog))
+                self.background_tasks.add(task)
+                task.add_done_callback(self.background_tasks.discard)
+
+    async def warm_up_cog(self, extension: str, cog: commands.Cog) -> None:
+        """
+        Runs the optional `warm_up` coroutine of a cog, e.g. filling its caches, without holding up the startup.
+        """
+        start = self.startup_clock()
+        try:
+            await cog.warm_up()
+        except Exception as e:
+            self.record_cog(f"{extension} (warm-up)", start, "failed")
+            self.logger.error(f"Failed to warm up extension {extension}\n{type(e).__name__}: {e}")
+            return
+        entry = self.record_cog(f"{extension} (warm-up)", start, "warmed up")
+        self.logger.info(f"Warmed up extension '{extension}' in {entry.duration:.1f}ms")
+
+    def startup_clock(self) -> float:
         """
-        for file in os.listdir(f"{os.path.realpath(os.path.dirname(__file__))}/cogs"):
-            if file.endswith(".py"):
-                extension = file[:-3]
-                try:
-                    await self.load_extension(f"cogs.{extension}")
-                    self.logger.info(f"Loaded extension '{extension}'")
-                except Exception as e:
-                    exception = f"{type(e).__name__}: {e}"
-                    self.logger.error(
-                        f"Failed to load extension {extension}\n{exception}"
-                    )
+        Milliseconds since the bot was created, the time base of the startup timeline.
+        """
+        return (time.perf_counter() - self.started_at) * 1000
+
+    def record_cog(self, cog: str, start: float, status: str) -> TimelineEntry:
+        if status in ("loaded", "failed", "skipped"):
+            self.cog_status[cog] = status
+        entry = TimelineEntry(cog, start, self.startup_clock(), status)
+        self.startup_timeline.append(entry)
+        return entry
+
+    async def load_cog_for(self, command_name) -> None:
+        """
+        Loads the cog of a command that was invoked before its cog was loaded.
+        """
+        extension = self.pending_commands.get(command_name)
+        if extension is not None:
+            self.logger.info(f"Loading extension '{extension}' on demand for '{command_name}'")
+            await self.load_cog(extension)
+
+    def register_cog_manifest(self) -> None:
+        """
+        Registers the commands and dependencies of every cog from their source, without importing the cogs.
+        """
+        start = time.perf_counter()
+        self.cog_manifest = build_cog_manifest(COGS_DIR)
+        self.pending_extensions = set(self.cog_manifest)
+        self.pending_commands = {
+            name: extension for extension, cog in self.cog_manifest.items() for name in cog.commands
+        }
+        for extension in find_dependency_cycles(self.cog_manifest):
+            self.pending_extensions.discard(extension)
+            self.record_cog(extension, self.startup_clock(), "failed")
+            self.logger.error(f"Failed to load extension {extension}\nIt is part of a dependency cycle")
+        self.logger.info(
+            f"Registered {len(self.pending_commands)} commands of {len(self.cog_manifest)} cogs in {(time.perf_counter() - start) * 1000:.1f}ms"
+        )
+
+    async def load_cogs_in_background(self) -> None:
+        start = time.perf_counter()
+        await self.load_cogs()
+        self.logger.info(f"Loaded the remaining cogs in the background in {(time.perf_counter() - start) * 1000:.1f}ms")
+        self.report_imports()
+
+    def report_imports(self) -> None:
+        """
+        Logs the slowest third-party imports of the startup and stops timing imports.
+        """
+        import_timer.uninstall()
+        slowest = ", ".join(f"{module} {elapsed * 1000:.1f}ms" for module, elapsed in import_timer.slowest())
+        self.logger.info(f"Slowest imports: {slowest}")
 
     @tasks.loop(minutes=5.0)
     async def status_task(self) -> None:
@@ -211,7 +524,16 @@ class DiscordBot(commands.Bot):
                         "Process - Casual", "Snakewater - Casual", "Steel - Casual", "Swiftwater - Casual", "Thunder Mountain - Casual",
                         "Upward - Casual", "Viaduct - Casual", "Yukon - Casual", "Badlands - Casual", "Barnblitz - Casual",
                         "Doomsday - Casual", "Enclosure - Casual", "Foundry - Casual", "Gold Rush - Casual", "Gorge - Casual"]
-            await self.change_presence(activity=discord.Activity(type=discord.ActivityType.playing, name=f"Team Fortress 2 - {random.choice(statuses)}"))
+            if self.sharded:
+                # Each shard gets its own status, shards that are reconnecting get theirs on the next run
+                for shard_id, shard in self.shards.items():
+                    if not shard.is_closed():
+                        await self.change_presence(
+                            activity=discord.Activity(type=discord.ActivityType.playing, name=f"Team Fortress 2 - {random.choice(statuses)}"),
+                            shard_id=shard_id,
+                        )
+            else:
+                await self.change_presence(activity=discord.Activity(type=discord.ActivityType.playing, name=f"Team Fortress 2 - {random.choice(statuses)}"))
         # channel = self.get_channel(1240624554544726037)
         # random_message = random.choice(
         #     ["Meine Wurstnudel tut weh! Bitte, oh bitte reiben Sie sie!", "Ich bin ein kleiner, dummer Bot!", "Gott, du riechst so gut......", "Ich mag es, wie du mich benutzt, um deine Ersparnisse zu verspielen. Das macht mich wirklich an.", "Du solltest wetten :)", "BLACKJACK JETZT SPIELEN", "Ich hoffe wirklich, dass Sie von einer hohen Klippe fallen."]
@@ -236,33 +558,85 @@ class DiscordBot(commands.Bot):
             f"Running on: {platform.system()} {platform.release()} ({os.name})"
         )
         self.logger.info("-------------------")
+        # Started first, so blocking calls during the rest of the startup are caught too
+        self.watchdog.start()
+        self.config_service.start()
+        pool = DatabasePool(
+            DB_PATH,
+            readers=self.config.get("database_readers", 4),
+            slow_query_ms=self.config.get("slow_query_ms", 100),
+        )
+        await pool.open()
+        pool.observer = self.metrics.observe_db
+        self.database = DatabaseManager(pool=pool)
         await self.init_db()
-        await self.load_cogs()
+        await self.warm_prefix_cache()
+        self.http_session = create_http_session(self.http_stats)
+        exporter = self.config.get("metrics_exporter")
+        if exporter:
+            host, port = exporter.get("host", "127.0.0.1"), exporter.get("port", 9108)
+            self.metrics_exporter = await start_exporter(self.metrics, host, port)
+            self.logger.info(f"Serving metrics on http://{host}:{port}/metrics")
+        self.register_cog_manifest()
+        if not self.lazy_cogs:
+            start = time.perf_counter()
+            await self.load_cogs()
+            self.logger.info(f"Loaded {len(self.extensions)} cogs in {(time.perf_counter() - start) * 1000:.1f}ms")
+            self.report_imports()
         self.status_task.start()
-        self.database = DatabaseManager(
-            connection=await aiosqlite.connect(
-                f"{os.path.realpath(os.path.dirname(__file__))}/database/database.db"
-            )
-        )
+
+    async def close(self) -> None:
+        await super().close()
+        self.watchdog.stop()
+        self.config_service.stop()
+        if self.metrics_exporter is not None:
+            await self.metrics_exporter.cleanup()
+        if self.http_session is not None:
+            await self.http_session.close()
+        if self.database is not None:
+            await self.database.close()
+
+    @property
+    def sharded(self) -> bool:
+        return isinstance(self, commands.AutoShardedBot)
 
     async def on_ready(self):
-        async with aiosqlite.connect(DB_PATH) as db:
-            c = await db.cursor()
-            for guild in self.guilds:
-                guild_id = guild.id
-                await c.execute("SELECT prefix FROM GuildSettings WHERE guild_id = ?", (guild_id,))
-                row = await c.fetchone()
-                if row is None:
-                    # If the guild is not in the database, insert it with the default prefix
-                    await c.execute("INSERT INTO GuildSettings (guild_id, prefix) VALUES (?, ?)", (guild_id, '>'))
-                    self.logger.error(f"Prefix for guild {guild.id} is not set, setting it to default prefix '>'")
-                else:
-                    prefix = row[0]
-                    if prefix is None:
-                        # If the guild is in the database but the prefix is None, update it with the default prefix
-                        await c.execute("UPDATE GuildSettings SET prefix = ? WHERE guild_id = ?", ('>', guild_id))
-                        self.logger.error(f"Prefix for guild {guild.id} is not set, setting it to default prefix '>'")
-            await db.commit()
+        if self.pending_extensions and self.background_cog_loader is None:
+            self.background_cog_loader = asyncio.create_task(self.load_cogs_in_background())
+        # Sharded, every shard bootstraps its own guilds as soon as it is ready
+        if not self.sharded:
+            await self.bootstrap_guilds(self.guilds)
+
+    async def on_shard_ready(self, shard_id: int) -> None:
+        """
+        Only dispatched when sharded, also after a shard reconnects with a new session.
+        """
+        guilds = [guild for guild in self.guilds if guild.shard_id == shard_id]
+        self.logger.info(f"Shard {shard_id} is ready with {len(guilds)} guilds")
+        await self.bootstrap_guilds(guilds)
+
+    async def on_guild_join(self, guild: discord.Guild) -> None:
+        await self.bootstrap_guilds([guild])
+
+    async def bootstrap_guilds(self, guilds) -> None:
+        """
+        Gives every guild the bot is in a GuildSettings row with a prefix.
+        Guilds already known from a previous run or an earlier on_ready are skipped.
+
+        :param guilds: The guilds to bootstrap.
+        """
+        new_guild_ids = [guild.id for guild in guilds if guild.id not in self.known_guilds]
+        if not new_guild_ids:
+            return
+        start = time.perf_counter()
+        changed = await self.database.bootstrap_guilds(new_guild_ids, DEFAULT_PREFIX)
+        elapsed = (time.perf_counter() - start) * 1000
+        for guild_id in new_guild_ids:
+            self.prefix_cache.setdefault(guild_id, DEFAULT_PREFIX)
+        self.known_guilds.update(new_guild_ids)
+        self.logger.info(
+            f"Bootstrapped {len(new_guild_ids)} guilds in {elapsed:.1f}ms ({changed} rows set to the default prefix '{DEFAULT_PREFIX}')"
+        )
 
     async def on_message(self, message: discord.Message) -> None:
         """
@@ -274,6 +648,35 @@ class DiscordBot(commands.Bot):
             return
         await self.process_commands(message)
 
+    async def process_commands(self, message: discord.Message) -> None:
+        context = await self.get_context(message)
+        if context.command is None and context.invoked_with in self.pending_commands:
+            # The command exists, its cog just has not been loaded yet
+            await self.load_cog_for(context.invoked_with)
+            context = await self.get_context(message)
+        await self.invoke(context)
+
+    async def before_command(self, context: Context) -> None:
+        """
+        Starts timing a command once its checks passed, DB and HTTP time is attributed to it from now on.
+        """
+        context.metrics = self.metrics.start(context.command.qualified_name)
+
+    async def after_command(self, context: Context) -> None:
+        self.finish_command(context)
+
+    def finish_command(self, context: Context) -> None:
+        # Failed slash invocations of hybrid commands skip the after invoke hook, so errors finish them too
+        invocation = getattr(context, "metrics", None)
+        if invocation is not None:
+            context.metrics = None
+            self.metrics.finish(invocation)
+
+    async def on_app_command_completion(self, interaction: discord.Interaction, command) -> None:
+        invocation = interaction.extras.pop("metrics", None)
+        if invocation is not None:
+            self.metrics.finish(invocation)
+
     async def on_command_completion(self, context: Context) -> None:
         """
         The code in this event is executed every time a normal command has been *successfully* executed.
@@ -303,6 +706,9 @@ class DiscordBot(commands.Bot):
         :param context: The context of the normal command that failed executing.
         :param error: The error that has been faced.
         """
+        if context.command is not None:
+            self.finish_command(context)
+            self.metrics.record_error(context.command.qualified_name, getattr(error, "original", error))
         if isinstance(error, commands.CommandOnCooldown):
             minutes, seconds = divmod(error.retry_after, 60)
             hours, minutes = divmod(minutes, 60)
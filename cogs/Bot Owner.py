@@ -1,19 +1,21 @@
-import json
+import asyncio
+import collections
+import math
 import os
-import sqlite3
+import tempfile
 
-import aiosqlite
 import discord
 from discord import app_commands
 from discord.ext import commands
 from discord.ext.commands import Context
 
-DATABASE_DIR = "database"
-ABS_PATH = os.path.dirname(os.path.abspath(__file__))
-DB_PATH = os.path.join(DATABASE_DIR, "database.db")
+from database import EXPORT_TABLES
+from utils.export import FORMATS, write_export
 
-conn = sqlite3.connect(DB_PATH)
-c = conn.cursor()
+# Shards listed by the shards command, the rest are summed up to stay within the embed limits
+SHARDS_SHOWN = 50
+# Total characters Discord allows in the title, description, fields and footer of an embed
+EMBED_CHARACTERS = 6000
 
 
 class Owner(commands.Cog, name="owner"):
@@ -21,28 +23,16 @@ class Owner(commands.Cog, name="owner"):
         self.bot = bot
 
     async def load_config(self):
-        try:
-            with open('config.json', 'r') as f:
-                return json.load(f)
-        except FileNotFoundError:
-            return {}
+        # A mutable copy of the bot's snapshot, edit it and pass it to save_config
+        return self.bot.config_service.copy()
 
     async def save_config(self, config):
-        with open('config.json', 'w') as f:
-            json.dump(config, f, indent=4)
-
-    async def guild_prefix(db, guild_id, prefix=None):
-        async with aiosqlite.connect(DB_PATH) as conn:
-            c = await conn.cursor()
-            if prefix is not None:
-                # Write to the table
-                await c.execute("UPDATE GuildSettings SET prefix = ? WHERE guild_id = ?", (prefix, guild_id))
-                await conn.commit()
-            else:
-                # Read from the table
-                await c.execute("SELECT prefix FROM GuildSettings WHERE guild_id = ?", (guild_id,))
-                row = await c.fetchone()
-                return row[0] if row else None
+        # Written in a worker thread to a temporary file that replaces config.json
+        await self.bot.config_service.save(config)
+
+    async def guild_prefix(self, guild_id, prefix=None):
+        # Goes through the bot so the shared prefix cache stays in sync
+        return await self.bot.guild_prefix(guild_id, prefix)
 
     @commands.command(
         name="sync",
@@ -58,6 +48,8 @@ class Owner(commands.Cog, name="owner"):
         :param scope: The scope of the sync. Can be `global` or `guild`.
         """
 
+        # Lazily loaded cogs have not registered their slash commands yet
+        await context.bot.load_cogs()
         if scope == "global":
             await context.bot.tree.sync()
             embed = discord.Embed(
@@ -132,9 +124,8 @@ class Owner(commands.Cog, name="owner"):
         :param context: The hybrid command context.
         :param cog: The name of the cog to load.
         """
-        try:
-            await self.bot.load_extension(f"cogs.{cog}")
-        except Exception:
+        # Goes through the bot so the lazy loader and the startup timeline know about it
+        if f"cogs.{cog}" in self.bot.extensions or not await self.bot.load_cog(cog, retry=True):
             embed = discord.Embed(
                 description=f"Could not load the `{cog}` cog.", color=0xE02B2B
             )
@@ -159,7 +150,7 @@ class Owner(commands.Cog, name="owner"):
         :param cog: The name of the cog to unload.
         """
         try:
-            await self.bot.unload_extension(f"cogs.{cog}")
+            await self.bot.unload_cog(cog)
         except Exception:
             embed = discord.Embed(
                 description=f"Could not unload the `{cog}` cog.", color=0xE02B2B
@@ -185,7 +176,7 @@ class Owner(commands.Cog, name="owner"):
         :param cog: The name of the cog to reload.
         """
         try:
-            await self.bot.reload_extension(f"cogs.{cog}")
+            await self.bot.reload_cog(cog)
         except Exception:
             embed = discord.Embed(
                 description=f"Could not reload the `{cog}` cog.", color=0xE02B2B
@@ -243,5 +234,330 @@ class Owner(commands.Cog, name="owner"):
         embed = discord.Embed(description=message, color=0xBEBEFE)
         await context.send(embed=embed)
 
+    @commands.hybrid_command(
+        name="httpstats",
+        description="Shows the connection pool statistics of the shared HTTP client.",
+    )
+    @commands.is_owner()
+    async def httpstats(self, context: Context) -> None:
+        """
+        Shows the connection pool statistics of the shared HTTP client.
+
+        :param context: The hybrid command context.
+        """
+        stats = self.bot.http_stats.snapshot(self.bot.http_session)
+        embed = discord.Embed(title="HTTP Client", color=0xBEBEFE)
+        embed.add_field(name="Requests", value=f"{stats['requests']} ({stats['failed_requests']} failed)", inline=True)
+        embed.add_field(name="In Flight", value=stats["in_flight"], inline=True)
+        embed.add_field(
+            name="Open Connections",
+            value=f"{stats.get('open_connections', 0)} ({stats.get('active_connections', 0)} active, {stats.get('idle_connections', 0)} idle)",
+            inline=True,
+        )
+        embed.add_field(
+            name="Connection Reuse",
+            value=f"{stats['reuse_ratio']:.0%} ({stats['connections_reused']} reused, {stats['connections_created']} created)",
+            inline=True,
+        )
+        embed.add_field(name="DNS Cache", value=f"{stats['dns_cache_hits']} hits, {stats['dns_cache_misses']} misses", inline=True)
+        for host, limits in self.bot.rate_limiter.snapshot().items():
+            embed.add_field(
+                name=f"Rate Limit: {host}",
+                value=f"{limits['requests']} requests, {limits['queued']} queued, {limits['throttled']} throttled\n"
+                      f"Wait: {limits['average_wait'] * 1000:.0f}ms avg, {limits['max_wait'] * 1000:.0f}ms max",
+                inline=False,
+            )
+        await context.send(embed=embed)
+
+    @commands.hybrid_command(
+        name="steamcache",
+        description="Shows the hit rate and size of the Steam lookup cache.",
+    )
+    @commands.is_owner()
+    async def steamcache(self, context: Context) -> None:
+        """
+        Shows the hit rate and size of the Steam lookup cache.
+
+        :param context: The hybrid command context.
+        """
+        steam = self.bot.get_cog("steamtools")
+        if steam is None:
+            embed = discord.Embed(description="The `steamtools` cog is not loaded.", color=0xE02B2B)
+            await context.send(embed=embed)
+            return
+        cache = steam.api.cache
+        counts = cache.counts()
+        embed = discord.Embed(title="Steam Cache", color=0xBEBEFE)
+        embed.add_field(name="Hit Rate", value=f"{cache.hit_rate:.1%} ({cache.hits} hits, {cache.misses} misses)", inline=False)
+        embed.add_field(name="Entries", value=f"{sum(counts.values())} / {cache.maxsize} ({cache.evictions} evicted)", inline=False)
+        embed.add_field(
+            name="Coalesced Lookups",
+            value=f"{steam.api.flight.coalesced} waited on an identical lookup, {steam.api.flight.owned} went upstream",
+            inline=False,
+        )
+        for kind, count in sorted(counts.items()):
+            embed.add_field(name=kind, value=count, inline=True)
+        await context.send(embed=embed)
+
+    @commands.hybrid_command(
+        name="flushsteamcache",
+        description="Empties the Steam lookup cache, in memory and in the database.",
+    )
+    @commands.is_owner()
+    async def flushsteamcache(self, context: Context) -> None:
+        """
+        Empties the Steam lookup cache, in memory and in the database.
+
+        :param context: The hybrid command context.
+        """
+        steam = self.bot.get_cog("steamtools")
+        if steam is not None:
+            steam.api.cache.clear()
+        await self.bot.database.clear_steam_cache()
+        embed = discord.Embed(description="The Steam cache has been flushed.", color=0xBEBEFE)
+        await context.send(embed=embed)
+
+    @commands.hybrid_command(
+        name="startup",
+        description="Shows when each cog was loaded during the startup.",
+    )
+    @commands.is_owner()
+    async def startup(self, context: Context) -> None:
+        """
+        Shows when each cog was loaded during the startup.
+
+        :param context: The hybrid command context.
+        """
+        timeline = sorted(self.bot.startup_timeline, key=lambda entry: entry.start)
+        if not timeline:
+            embed = discord.Embed(description="No cogs have been loaded yet.", color=0xE02B2B)
+            await context.send(embed=embed)
+            return
+        lines = [
+            f"`{entry.start:>8.1f}ms → {entry.end:>8.1f}ms` **{entry.cog}** {entry.status} ({entry.duration:.1f}ms)"
+            for entry in timeline
+        ]
+        embed = discord.Embed(title="Startup Timeline", description="\n".join(lines), color=0xBEBEFE)
+        pending = sorted(self.bot.pending_extensions)
+        if pending:
+            embed.add_field(name="Not Loaded Yet", value=", ".join(pending), inline=False)
+        embed.set_footer(text="Times since the bot was created")
+        await context.send(embed=embed)
+
+    @commands.hybrid_command(
+        name="metrics",
+        description="Shows the latency, throughput and errors of every command, and the prefix cache hit rate.",
+    )
+    @commands.is_owner()
+    async def metrics(self, context: Context) -> None:
+        """
+        Shows the latency, throughput and errors of every command, and the prefix cache hit rate.
+
+        :param context: The hybrid command context.
+        """
+        metrics = self.bot.metrics
+        embed = discord.Embed(title="Command Metrics", color=0xBEBEFE)
+        busiest = sorted(metrics.commands.items(), key=lambda item: item[1].latency.count, reverse=True)
+        # Embeds hold at most 25 fields, three are kept for the totals
+        for name, stats in busiest[:22]:
+            latency = stats.latency
+            errors = ", ".join(f"{error} ×{count}" for error, count in sorted(stats.errors.items())) or "none"
+            embed.add_field(
+                name=name,
+                value=f"{latency.count} runs, {stats.in_flight} in flight\n"
+                      f"p50 ≤ {latency.quantile(0.5) * 1000:.0f}ms, p95 ≤ {latency.quantile(0.95) * 1000:.0f}ms, "
+                      f"p99 ≤ {latency.quantile(0.99) * 1000:.0f}ms\n"
+                      f"DB {stats.db_seconds * 1000:.0f}ms, HTTP {stats.http_seconds * 1000:.0f}ms total\n"
+                      f"Errors: {errors}",
+                inline=True,
+            )
+        embed.add_field(
+            name="Database",
+            value=f"{metrics.db.count} calls, {metrics.db.mean * 1000:.1f}ms avg, p95 ≤ {metrics.db.quantile(0.95) * 1000:.0f}ms",
+            inline=False,
+        )
+        embed.add_field(
+            name="HTTP",
+            value=f"{metrics.http.count} requests, {metrics.http.mean * 1000:.1f}ms avg, p95 ≤ {metrics.http.quantile(0.95) * 1000:.0f}ms",
+            inline=False,
+        )
+        lookups = self.bot.prefix_cache_hits + self.bot.prefix_cache_misses
+        embed.add_field(
+            name="Prefix Cache",
+            value=f"{self.bot.prefix_cache_hits / lookups if lookups else 0:.1%} hit rate "
+                  f"({self.bot.prefix_cache_hits} hits, {self.bot.prefix_cache_misses} misses), "
+                  f"{len(self.bot.prefix_cache)} guilds cached",
+            inline=False,
+        )
+        await context.send(embed=embed)
+
+    @commands.hybrid_command(
+        name="sqlstats",
+        description="Shows the SQL statements that took the most time in total.",
+    )
+    @app_commands.describe(count="How many statements to show, 10 by default")
+    @commands.is_owner()
+    async def sqlstats(self, context: Context, count: int = 10) -> None:
+        """
+        Shows the SQL statements that took the most time in total.
+
+        :param context: The hybrid command context.
+        :param count: How many statements to show.
+        """
+        stats = self.bot.database.pool.stats
+        top = stats.top(max(1, min(count, 20)))
+        if not top:
+            embed = discord.Embed(description="No SQL statements have run yet.", color=0xE02B2B)
+            await context.send(embed=embed)
+            return
+        embed = discord.Embed(
+            title="SQL Statements",
+            description=f"{sum(s.count for s in stats.statements.values())} statements run, "
+                        f"{stats.slow_statements} slower than {stats.slow_threshold * 1000:.0f}ms",
+            color=0xBEBEFE,
+        )
+        for shown, (statement, statement_stats) in enumerate(top):
+            value = (
+                f"```sql\n{statement[:700]}```"
+                f"{statement_stats.count} runs, {statement_stats.total * 1000:.1f}ms total, "
+                f"{statement_stats.average * 1000:.2f}ms avg, {statement_stats.max * 1000:.1f}ms max"
+            )
+            if statement_stats.plan:
+                value += f"\nPlan: {statement_stats.plan[:200]}"
+            name = f"{statement_stats.total * 1000:.1f}ms"
+            # Embeds hold at most 6000 characters in total, room is kept for the footer
+            if len(embed) + len(name) + len(value) > EMBED_CHARACTERS - 100:
+                embed.set_footer(text=f"{len(top) - shown} more statements left out to fit Discord's embed limit")
+                break
+            embed.add_field(name=name, value=value, inline=False)
+        await context.send(embed=embed)
+
+    @commands.hybrid_command(
+        name="looplag",
+        description="Shows how long the event loop has been blocked, and where.",
+    )
+    @commands.is_owner()
+    async def looplag(self, context: Context) -> None:
+        """
+        Shows how long the event loop has been blocked, and where.
+
+        :param context: The hybrid command context.
+        """
+        watchdog = self.bot.watchdog
+        embed = discord.Embed(
+            title="Event Loop Lag",
+            description=f"Last {len(watchdog.samples)} samples, one every {watchdog.interval * 1000:.0f}ms",
+            color=0xBEBEFE,
+        )
+        embed.add_field(name="p50", value=f"{watchdog.percentile(0.5) * 1000:.1f}ms", inline=True)
+        embed.add_field(name="p95", value=f"{watchdog.percentile(0.95) * 1000:.1f}ms", inline=True)
+        embed.add_field(name="p99", value=f"{watchdog.percentile(0.99) * 1000:.1f}ms", inline=True)
+        embed.add_field(name="Max", value=f"{watchdog.max_lag * 1000:.1f}ms since startup", inline=True)
+        embed.add_field(
+            name=f"Over {watchdog.threshold * 1000:.0f}ms",
+            value=f"{watchdog.over_threshold} recent samples, {len(watchdog.stalls)} stalls captured",
+            inline=True,
+        )
+        if watchdog.stalls:
+            stall = watchdog.stalls[-1]
+            # The innermost frames are the interesting ones, keep the end of the stack
+            embed.add_field(
+                name=f"Last Stall: {stall.blocked_for * 1000:.0f}ms in {stall.task} <t:{int(stall.detected_at)}:R>",
+                value=f"```py\n{stall.stack[-900:]}```",
+                inline=False,
+            )
+        await context.send(embed=embed)
+
+    @commands.hybrid_command(
+        name="shards",
+        description="Shows the latency and guild count of every shard.",
+    )
+    @commands.is_owner()
+    async def shards(self, context: Context) -> None:
+        """
+        Shows the latency and guild count of every shard.
+
+        :param context: The hybrid command context.
+        """
+        bot = self.bot
+        guild_counts = collections.Counter(guild.shard_id for guild in bot.guilds)
+        if bot.sharded:
+            shards = [(shard_id, shard.latency, shard.is_closed()) for shard_id, shard in sorted(bot.shards.items())]
+        else:
+            shards = [(0, bot.latency, bot.is_closed())]
+        lines = []
+        for shard_id, latency, closed in shards[:SHARDS_SHOWN]:
+            # The latency is infinite until the first heartbeat was acknowledged
+            latency = f"{latency * 1000:.0f}ms" if math.isfinite(latency) else "no heartbeat yet"
+            lines.append(
+                f"`{shard_id:>3}` {latency}, {guild_counts[shard_id]} guilds{' (disconnected)' if closed else ''}"
+            )
+        if len(shards) > SHARDS_SHOWN:
+            lines.append(f"... and {len(shards) - SHARDS_SHOWN} more")
+        embed = discord.Embed(
+            title="Shards",
+            description="\n".join(lines),
+            color=0xBEBEFE,
+        )
+        embed.set_footer(
+            text=f"{bot.shard_count or 1} shards, {len(bot.guilds)} guilds"
+            + (f", this server is on shard {context.guild.shard_id}" if context.guild else "")
+            + ("" if bot.sharded else ", not sharded")
+        )
+        await context.send(embed=embed)
+
+    @commands.hybrid_command(
+        name="export",
+        description="Exports the warns, tracked Steam accounts or settings of this server as a file.",
+    )
+    @app_commands.describe(
+        table="What to export: `warns`, `steam` or `guildsettings`",
+        file_format="The file format: `csv` or `jsonl`",
+    )
+    @commands.check_any(commands.is_owner(), commands.has_permissions(administrator=True))
+    @commands.guild_only()
+    async def export(self, context: Context, table: str, file_format: str = "csv") -> None:
+        """
+        Exports the warns, tracked Steam accounts or settings of this server as a file.
+
+        :param context: The hybrid command context.
+        :param table: What to export: `warns`, `steam` or `guildsettings`.
+        :param file_format: The file format: `csv` or `jsonl`.
+        """
+        table, file_format = table.lower(), file_format.lower()
+        if table not in EXPORT_TABLES or file_format not in FORMATS:
+            embed = discord.Embed(
+                description=f"The table must be one of `{'`, `'.join(EXPORT_TABLES)}` and the format one of `{'`, `'.join(FORMATS)}`.",
+                color=0xE02B2B,
+            )
+            await context.send(embed=embed)
+            return
+        await context.defer()
+        guild = context.guild
+        rows = self.bot.database.export_rows(table, guild.id)
+        if table == "steam":
+            # Tracked accounts belong to users, not guilds, export the ones tracked by members of this guild
+            rows = (row async for row in rows if guild.get_member(row[1]) is not None)
+        descriptor, path = await asyncio.to_thread(tempfile.mkstemp, prefix=f"{table}-", suffix=f".{file_format}")
+        try:
+            # Rows are streamed into the file a chunk at a time, the export is never held in memory
+            with os.fdopen(descriptor, "w", encoding="utf-8", newline="") as file:
+                count = await write_export(rows, EXPORT_TABLES[table][1], file_format, file)
+            size = os.path.getsize(path)
+            if size > guild.filesize_limit:
+                embed = discord.Embed(
+                    description=f"The export of `{table}` is {size / 1024 / 1024:.1f} MB, over the upload limit of this server.",
+                    color=0xE02B2B,
+                )
+                await context.send(embed=embed)
+                return
+            embed = discord.Embed(
+                description=f"Exported {count} rows of `{table}` as {file_format.upper()}.", color=0xBEBEFE
+            )
+            await context.send(embed=embed, file=discord.File(path, filename=f"{table}-{guild.id}.{file_format}"))
+        finally:
+            await asyncio.to_thread(os.remove, path)
+
+
 async def setup(bot) -> None:
     await bot.add_cog(Owner(bot))
@@ -1,30 +1,25 @@
+import asyncio
 import json
-import os
+import math
+import time
 import urllib.parse
 from datetime import datetime
 
-import aiohttp
-import aiosqlite
 import discord
 from discord import app_commands
 from discord.ext import commands, tasks
 from discord.ext.commands import Context
-from steam.steamid import SteamID
 
-DATABASE_DIR = "database"
-ABS_PATH = os.path.dirname(os.path.abspath(__file__))
-DB_PATH = os.path.join(DATABASE_DIR, "database.db")
+from utils.http import RateLimiter
+from utils.steam import SteamAPI
+from utils.tf2_status import parse_status
+
 
 # Steam API Setup
 steam_api_key = ""
 access_token = ""
 steam_id_test = ""
 
-get_player_summaries = "https://api.steampowered.com/ISteamUser/GetPlayerSummaries/v2/?"
-get_player_bans = "https://api.steampowered.com/ISteamUser/GetPlayerBans/v1/?"
-get_friends_list = "https://api.steampowered.com/ISteamUser/GetFriendList/v1/?"
-convert_to_steamid64 = "https://api.steampowered.com/ISteamUser/ResolveVanityURL/v1/?"
-
 # FACEIT API Setup
 player_search_url = "https://open.faceit.com/data/v4/players"
 
@@ -34,111 +29,70 @@ headers = {
 }
 
 # SteamHistory.net API Setup
-
-# Example Data: 
-
-# {
-#  "response": [
-#   {
-#    "SteamID": "7656XXXXXXXXXXXXX",
-#    "Name": "Username",
-#    "CurrentState": "Permanent",
-#    "BanReason": "Hacker",
-#    "UnbanReason": null,
-#    "BanTimestamp": 1685513965,
-#    "UnbanTimestamp": 0,
-#    "Server": "Skial"
-#   }
-#  ]
-# }
-
 steamhistory_api_key = ""
-get_sourcebans = "https://steamhistory.net/api/sourcebans?key=key&shouldkey=0&steamids={steamids}"
-
-
-async def get_steam_profile_name(steamid64):
-    url = f"http://api.steampowered.com/ISteamUser/GetPlayerSummaries/v0002/?key={steam_api_key}&steamids={steamid64}"
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url) as response:
-            data = await response.json()
-            if 'response' in data and 'players' in data['response']:
-                players = data['response']['players']
-                if players:
-                    return players[0]['personaname']
-            return "Unknown Player"  # Or handle this case as you see fit
-        
-async def scrape_status_command(status):
-    steamids = []
-    flaggedids = []
-    map_name = ""
-    valve_official = False
-    players = 0
-    max_players = 0
-    hostname = ""
-
-    for line in status.split("\n"):
-        print(f"Processing line: {line}")
-        if line.startswith("#") and "[U:1:" not in line:
-            print("Skipping comment line.")
-            continue
-        if "[U:1:" in line:
-            steamid = line.split("[U:1:")[1].split("]")[0]
-            steamids.append(f"[U:1:{steamid}]")
-            print(f"Found SteamID: [U:1:{steamid}]")
-        elif line.startswith("map"):
-            map_name = line.split(":")[1].strip().split(" ")[0]
-            print(f"Found map name: {map_name}")
-        elif line.startswith("tags"):
-            valve_official = "valve" in line
-            print(f"Valve official server: {valve_official}")
-        elif line.startswith("players"):
-            players_info = line.split(":")[1].strip().split(",")[0]
-            players = int(players_info.split(" ")[0])
-            max_players = int(line.split("(")[1].split(" ")[0])
-            print(f"Found players info: {players}/{max_players}")
-        elif line.startswith("hostname"):
-            hostname = line.split(":", 1)[1].strip()
-            print(f"Found hostname: {hostname}")
-
-    print("Finished scraping status command output.")
-
-    for steamid in steamids:
-        print(f"Processing SteamID: {steamid}")
-        steamid64 = SteamID(steamid).as_64
-        steam_profile_name = await get_steam_profile_name(steamid64)
-
-        async with aiohttp.ClientSession() as session:
-            # Get sourcebans info
-            async with session.get(get_sourcebans.format(steamids=steamid64)) as response:
-                data = await response.json()
-                if data['response']:
-                    sourcebans = data['response']
-                    bans_info = []
-                    for ban in sourcebans:
-                        ban_info = {
-                            "name_at_ban": ban['Name'],
-                            "ban_reason": ban['BanReason'],
-                            "ban_timestamp": datetime.utcfromtimestamp(ban['BanTimestamp']).strftime('%d-%m-%Y @ %H:%M:%S'),
-                            "unban_timestamp": datetime.utcfromtimestamp(ban['UnbanTimestamp']).strftime('%d-%m-%Y @ %H:%M:%S') if ban['UnbanTimestamp'] != 0 else "N/A",
-                            "unban_reason": ban['UnbanReason'],
-                            "server": ban['Server'],
-                            "current_state": ban['CurrentState']
-                        }
-                        flaggedids.append(steamid)
-                        bans_info.append(ban_info)
-                else:
-                    bans_info = [{
-                        "name_at_ban": "N/A",
-                        "ban_reason": "No bans found.",
-                        "ban_timestamp": "N/A",
-                        "unban_timestamp": "N/A",
-                        "server": "N/A",
-                        "current_state": "N/A"
-                    }]
 
-        
+# Ban watch setup, every tracked account is checked once per interval
+BAN_WATCH_INTERVAL_MINUTES = 15.0
+# Tracked accounts read and checked at once, both ban APIs accept up to 100 SteamIDs per request
+BAN_WATCH_PAGE_SIZE = 100
+
+
+def format_ban(ban):
+    return {
+        "name_at_ban": ban['Name'],
+        "ban_reason": ban['BanReason'],
+        "ban_timestamp": datetime.utcfromtimestamp(ban['BanTimestamp']).strftime('%d-%m-%Y @ %H:%M:%S'),
+        "unban_timestamp": datetime.utcfromtimestamp(ban['UnbanTimestamp']).strftime('%d-%m-%Y @ %H:%M:%S') if ban['UnbanTimestamp'] != 0 else "N/A",
+        "unban_reason": ban['UnbanReason'],
+        "server": ban['Server'],
+        "current_state": ban['CurrentState']
+    }
+
+
+def ban_state(player_bans, sourcebans):
+    """
+    Reduces the GetPlayerBans record and the SourceBans records of a player to what the ban watch compares.
+    """
+    state = {
+        "sourcebans": {
+            f"{ban['Server']}:{ban['BanTimestamp']}": [ban['CurrentState'], ban['Server'], ban['BanReason']]
+            for ban in sourcebans
+        }
+    }
+    if player_bans is not None:
+        state["vac_bans"] = player_bans['NumberOfVACBans']
+        state["game_bans"] = player_bans['NumberOfGameBans']
+        state["community_banned"] = player_bans['CommunityBanned']
+        state["economy_ban"] = player_bans['EconomyBan']
+    return state
+
+
+def diff_ban_states(old, new):
+    """
+    Lists the bans and unbans between two states returned by ban_state.
+    """
+    changes = []
+    for key, (current_state, server, reason) in new["sourcebans"].items():
+        previous = old.get("sourcebans", {}).get(key)
+        if previous is None:
+            changes.append(f"New SourceBans ban on **{server}**: {reason} ({current_state})")
+        elif previous[0] != current_state:
+            if current_state == "Unbanned":
+                changes.append(f"Unbanned on **{server}**")
+            else:
+                changes.append(f"Ban on **{server}** is now {current_state}")
+    if "vac_bans" in old and "vac_bans" in new:
+        for field, name in (("vac_bans", "VAC"), ("game_bans", "game")):
+            if new[field] > old[field]:
+                changes.append(f"New {name} ban ({new[field]} in total)")
+            elif new[field] < old[field]:
+                changes.append(f"{name.capitalize()} ban removed ({new[field]} left)")
+        if new["community_banned"] != old["community_banned"]:
+            changes.append("Community banned" if new["community_banned"] else "Community ban lifted")
+        if new["economy_ban"] != old["economy_ban"]:
+            changes.append(f"Trade ban status changed to {new['economy_ban']}")
+    return changes
 
-    return flaggedids, map_name, valve_official, players, max_players, hostname
 
 class status_form(discord.ui.Modal, title="TF2 Status Scraper"):
     feedback = discord.ui.TextInput(
@@ -156,6 +110,140 @@ class status_form(discord.ui.Modal, title="TF2 Status Scraper"):
 class SteamTools(commands.Cog, name="steamtools"):
     def __init__(self, bot):
         self.bot = bot
+        self.api = SteamAPI(bot.http_session, api_key=steam_api_key, limiter=bot.rate_limiter)
+        # Strong references to fire-and-forget tasks, so they aren't garbage collected mid-run
+        self.background_tasks = set()
+
+    async def cog_load(self) -> None:
+        self.save_cache.start()
+        self.ban_watch.start()
+
+    async def warm_up(self) -> None:
+        # Run by the bot after the cog is loaded, lookups before that just miss the cache
+        self.api.cache.load(await self.bot.database.get_steam_cache())
+
+    async def cog_unload(self) -> None:
+        self.ban_watch.cancel()
+        self.save_cache.cancel()
+        await self.save_steam_cache()
+
+    async def save_steam_cache(self) -> None:
+        """
+        Writes the cache entries added since the last save to the SteamCache table.
+        """
+        rows = self.api.cache.take_dirty()
+        if rows:
+            await self.bot.database.save_steam_cache(rows)
+
+    @tasks.loop(minutes=1.0)
+    async def save_cache(self) -> None:
+        await self.save_steam_cache()
+
+    @tasks.loop(minutes=BAN_WATCH_INTERVAL_MINUTES)
+    async def ban_watch(self) -> None:
+        """
+        Checks every tracked Steam account for new bans and unbans, one page at a time.
+
+        The pages are spread evenly over the interval so the ban APIs see a steady trickle
+        of batched requests instead of a burst at the start of every cycle.
+        """
+        total = await self.bot.database.count_tracked_steam_ids()
+        if total == 0:
+            return
+        pages = math.ceil(total / BAN_WATCH_PAGE_SIZE)
+        # Keep some headroom so a slow cycle doesn't run into the next one
+        spacing = BAN_WATCH_INTERVAL_MINUTES * 60 * 0.9 / pages
+        started = time.monotonic()
+        after = ""
+        checked = 0
+        while True:
+            page_started = time.monotonic()
+            rows = await self.bot.database.get_tracked_steam_ids(after, BAN_WATCH_PAGE_SIZE)
+            if not rows:
+                break
+            after = rows[-1][0]
+            try:
+                await self.check_bans(rows)
+            except Exception as e:
+                self.bot.logger.error(f"Ban watch failed to check {len(rows)} accounts after {after}: {type(e).__name__}: {e}")
+            checked += len(rows)
+            await asyncio.sleep(max(0.0, spacing - (time.monotonic() - page_started)))
+        self.bot.logger.info(f"Ban watch checked {checked} tracked accounts in {time.monotonic() - started:.0f}s")
+
+    @ban_watch.before_loop
+    async def before_ban_watch(self) -> None:
+        await self.bot.wait_until_ready()
+
+    async def check_bans(self, rows) -> None:
+        """
+        Compares the current bans of one page of tracked accounts with their last known state
+        and announces the differences.
+
+        :param rows: (steam_id, discord_id) rows of the tracked accounts.
+        """
+        steam_ids = [steam_id for steam_id, _ in rows]
+        player_bans, sourcebans = await asyncio.gather(
+            self.api.fetch_player_bans(steam_ids, priority=RateLimiter.BULK, fresh=True),
+            self.api.fetch_sourcebans(steam_ids, priority=RateLimiter.BULK, fresh=True),
+        )
+        await self.bot.database.merge_ban_history({steam_id: sourcebans.get(steam_id, []) for steam_id in steam_ids})
+        previous_states = await self.bot.database.get_ban_states(steam_ids)
+        changed_states = {}
+        for steam_id, discord_id in rows:
+            state = ban_state(player_bans.get(steam_id), sourcebans.get(steam_id, []))
+            previous = previous_states.get(steam_id)
+            if previous == state:
+                continue
+            changed_states[steam_id] = state
+            # The first check of an account only records its state
+            if previous is not None:
+                changes = diff_ban_states(previous, state)
+                if changes:
+                    await self.announce_ban_changes(steam_id, discord_id, changes)
+        if changed_states:
+            await self.bot.database.save_ban_states(changed_states)
+
+    async def announce_ban_changes(self, steam_id, discord_id, changes) -> None:
+        """
+        Posts ban changes in the ban channel of every guild the account's tracker shares with the bot.
+        """
+        profile = (await self.api.fetch_player_summaries([steam_id], priority=RateLimiter.BULK)).get(steam_id)
+        embed = discord.Embed(
+            title=f"Ban status changed: {profile['personaname'] if profile else steam_id}",
+            url=f"https://steamhistory.net/id/{steam_id}",
+            description="\n".join(changes),
+            color=discord.Color.red(),
+        )
+        if profile:
+            embed.set_thumbnail(url=profile['avatarfull'])
+        embed.set_footer(text=f"SteamID64: {steam_id}")
+        for guild_id, channel_id in (await self.bot.database.get_ban_channels()).items():
+            guild = self.bot.get_guild(guild_id)
+            if guild is None or guild.get_member(discord_id) is None:
+                continue
+            channel = guild.get_channel(channel_id)
+            if channel is not None:
+                await channel.send(embed=embed)
+
+    async def scrape_status_command(self, status):
+        """
+        Parses a status dump and looks up the profile and SourceBans records of every player in it.
+
+        :param status: The full output of the `status` command.
+        :return: The parsed status, the flagged players and a dict mapping SteamID64s to profiles.
+        """
+        result = parse_status(status)
+        self.bot.logger.debug(
+            f"Parsed status of '{result.hostname}' on {result.map_name}: {len(result.players)} players, {len(result.steamids64)} with a SteamID"
+        )
+        # Lobby scans are bulk lookups, interactive commands like info go ahead of them
+        profiles, sourcebans = await asyncio.gather(
+            self.api.fetch_player_summaries(result.steamids64, priority=RateLimiter.BULK),
+            self.api.fetch_sourcebans(result.steamids64, priority=RateLimiter.BULK),
+        )
+        flagged = [player for player in result.players if str(player.steamid64) in sourcebans]
+        self.bot.logger.debug(f"Flagged {len(flagged)} players: {', '.join(player.steamid for player in flagged)}")
+        return result, flagged, profiles
 
     @commands.hybrid_command(
         name="info",
@@ -166,12 +254,8 @@ class SteamTools(commands.Cog, name="steamtools"):
     )
     async def info(self, context: Context, steamid: str) -> None:
         await context.defer()
-        try:
-            if len(steamid) == 17:
-                steamid64 = steamid
-            else:
-                steamid64 = SteamID.from_url(steamid).as_64
-        except ValueError:
+        steamid64 = await self.api.resolve_steamid(steamid)
+        if steamid64 is None:
             embed = discord.Embed(
                 title="Invalid Steam ID",
                 description="Please enter a valid Steam ID, Steam ID3, Steam ID32, Steam ID64, or Steam profile URL.",
@@ -180,123 +264,125 @@ class SteamTools(commands.Cog, name="steamtools"):
             embed.set_footer(text=f"Requested by {context.author.name}", icon_url=context.author.avatar)
             await context.send(embed=embed)
             return
-        
-        has_bans = False
-
-        async with aiohttp.ClientSession() as session:
-            # Get sourcebans info
-            async with session.get(get_sourcebans.format(steamids=steamid64)) as response:
-                data = await response.json()
-                if data['response']:
-                    sourcebans = data['response']
-                    bans_info = []
-                    for ban in sourcebans:
-                        ban_info = {
-                            "name_at_ban": ban['Name'],
-                            "ban_reason": ban['BanReason'],
-                            "ban_timestamp": datetime.utcfromtimestamp(ban['BanTimestamp']).strftime('%d-%m-%Y @ %H:%M:%S'),
-                            "unban_timestamp": datetime.utcfromtimestamp(ban['UnbanTimestamp']).strftime('%d-%m-%Y @ %H:%M:%S') if ban['UnbanTimestamp'] != 0 else "N/A",
-                            "unban_reason": ban['UnbanReason'],
-                            "server": ban['Server'],
-                            "current_state": ban['CurrentState']
-                        }
-                        bans_info.append(ban_info)
-                    has_bans = True
-                else:
-                    bans_info = [{
-                        "name_at_ban": "N/A",
-                        "ban_reason": "No bans found.",
-                        "ban_timestamp": "N/A",
-                        "unban_timestamp": "N/A",
-                        "server": "N/A",
-                        "current_state": "N/A"
-                    }]
-
-            # Get player summaries
-            async with session.get(get_player_summaries + f"key={steam_api_key}&steamids={steamid64}") as response:
-                data = await response.json()
-                if data is not None:
-                        community_visibility_state_map = {
-                            1: "Private",
-                            2: "Friends Only",
-                            3: "Public"
-                        }
-
-                        profile_state_map = {
-                            0: "Not setup",
-                            1: "Setup"
-                        }
-
-                        persona_state_map = {
-                            0: "Offline",
-                            1: "Online",
-                            2: "Busy",
-                            3: "Away",
-                            4: "Snooze",
-                            5: "Looking to trade",
-                            6: "Looking to play"
-                        }
-
-                        profile = data['response']['players'][0]
-                        profile_name = profile['personaname']
-                        profile_url = profile['profileurl']
-                        avatar_url = profile['avatarfull']
-                        time_created = datetime.utcfromtimestamp(profile['timecreated']).strftime('%d-%m-%Y @ %H:%M:%S')
-                        community_visibility_state = community_visibility_state_map[profile['communityvisibilitystate']]
-                        profile_state = profile_state_map[profile['profilestate']]
-                        persona_state = persona_state_map[profile['personastate']]
-
-            # Create embed
-            if has_bans:
-                embed = discord.Embed(
-                    title=f"[FLAGGED] {profile_name}",
-                    url=profile_url,
-                    description=f"[SteamHistory](https://steamhistory.net/id/{steamid64}) bans detected.",
-                    color=discord.Color.red()
-                )
-            else:
-                embed = discord.Embed(
-                    title=f"{profile_name}",
-                    url=profile_url,
-                    description=f"[SteamHistory](https://steamhistory.net/id/{steamid64}) no bans detected.",
-                    color=discord.Color.blue()
-                )
-            embed.set_thumbnail(url=avatar_url)
-            embed.add_field(name="Account Created", value=time_created, inline=True)
-            embed.add_field(name="Community Visibility State", value=community_visibility_state, inline=True)
-            embed.add_field(name="Profile State", value=profile_state, inline=True)
-            embed.add_field(name="Persona State", value=persona_state, inline=True)
-            embed.add_field(name="\u200b", value="\u200b", inline=False)
-
-            if has_bans:
-                for ban in bans_info:
-                    if len(bans_info) == 1:
-                        embed.add_field(name="Name at Ban", value=ban['name_at_ban'], inline=True)
-                        embed.add_field(name="Ban Reason", value=ban['ban_reason'], inline=True)
-                        embed.add_field(name="Ban Timestamp", value=ban['ban_timestamp'], inline=True)
-                        if ban['current_state'] != "Permanent":
-                            embed.add_field(name="Unban Timestamp", value=ban["unban_timestamp"], inline=True)
-                        embed.add_field(name="Server", value=ban['server'], inline=True)
-                        embed.add_field(name="Current State", value=ban['current_state'], inline=True)
-                        if ban["current_state"] == "Unbanned":
-                            embed.add_field(name="Unban Reason", value=ban['unban_reason'], inline=True)
-                        embed.add_field(name="\u200b", value="\u200b", inline=False)
-                    else:
-                        embed.add_field(name="Ban #"+str(bans_info.index(ban)+1), value="", inline=False)
-                        embed.add_field(name="Name at Ban", value=ban['name_at_ban'], inline=True)
-                        embed.add_field(name="Ban Reason", value=ban['ban_reason'], inline=True)
-                        embed.add_field(name="Ban Timestamp", value=ban['ban_timestamp'], inline=True)
-                        if ban['current_state'] != "Permanent":
-                            embed.add_field(name="Unban Timestamp", value=ban["unban_timestamp"], inline=True)
-                        embed.add_field(name="Server", value=ban['server'], inline=True)
-                        embed.add_field(name="Current State", value=ban['current_state'], inline=True)
-                        if ban["current_state"] == "Unbanned":
-                            embed.add_field(name="Unban Reason", value=ban['unban_reason'], inline=True)
-                        embed.add_field(name="\u200b", value="\u200b", inline=False)
 
+        # Render from the local ban history right away, SteamHistory is checked in the background
+        local_bans, profiles = await asyncio.gather(
+            self.bot.database.get_ban_history(steamid64),
+            self.api.fetch_player_summaries([steamid64]),
+        )
+        profile = profiles.get(str(steamid64))
+        if profile is None:
+            embed = discord.Embed(
+                title="Steam Profile Not Found",
+                description=f"No Steam profile was found for `{steamid64}`.",
+                color=discord.Color.red()
+            )
             embed.set_footer(text=f"Requested by {context.author.name}", icon_url=context.author.avatar)
-
             await context.send(embed=embed)
+            return
+
+        message = await context.send(embed=self.build_info_embed(steamid64, profile, local_bans, context.author))
+        task = asyncio.create_task(self.refresh_info(message, steamid64, profile, context.author))
+        self.background_tasks.add(task)
+        task.add_done_callback(self.background_tasks.discard)
+
+    async def refresh_info(self, message, steamid64, profile, author) -> None:
+        """
+        Fetches the SourceBans records of a player, stores the new or changed ones and
+        edits the info embed, only if anything changed.
+        """
+        try:
+            upstream = await self.api.fetch_sourcebans([steamid64])
+            if await self.bot.database.merge_ban_history({str(steamid64): upstream.get(str(steamid64), [])}) == 0:
+                return
+            bans = await self.bot.database.get_ban_history(steamid64)
+            await message.edit(embed=self.build_info_embed(steamid64, profile, bans, author))
+        except Exception as e:
+            self.bot.logger.error(f"Failed to refresh the bans of {steamid64}: {type(e).__name__}: {e}")
+
+    def build_info_embed(self, steamid64, profile, bans, author) -> discord.Embed:
+        bans_info = [format_ban(ban) for ban in bans]
+        has_bans = bool(bans_info)
+
+        community_visibility_state_map = {
+            1: "Private",
+            2: "Friends Only",
+            3: "Public"
+        }
+
+        profile_state_map = {
+            0: "Not setup",
+            1: "Setup"
+        }
+
+        persona_state_map = {
+            0: "Offline",
+            1: "Online",
+            2: "Busy",
+            3: "Away",
+            4: "Snooze",
+            5: "Looking to trade",
+            6: "Looking to play"
+        }
+
+        profile_name = profile['personaname']
+        profile_url = profile['profileurl']
+        avatar_url = profile['avatarfull']
+        time_created = datetime.utcfromtimestamp(profile['timecreated']).strftime('%d-%m-%Y @ %H:%M:%S')
+        community_visibility_state = community_visibility_state_map[profile['communityvisibilitystate']]
+        profile_state = profile_state_map[profile['profilestate']]
+        persona_state = persona_state_map[profile['personastate']]
+
+        # Create embed
+        if has_bans:
+            embed = discord.Embed(
+                title=f"[FLAGGED] {profile_name}",
+                url=profile_url,
+                description=f"[SteamHistory](https://steamhistory.net/id/{steamid64}) bans detected.",
+                color=discord.Color.red()
+            )
+        else:
+            embed = discord.Embed(
+                title=f"{profile_name}",
+                url=profile_url,
+                description=f"[SteamHistory](https://steamhistory.net/id/{steamid64}) no bans detected.",
+                color=discord.Color.blue()
+            )
+        embed.set_thumbnail(url=avatar_url)
+        embed.add_field(name="Account Created", value=time_created, inline=True)
+        embed.add_field(name="Community Visibility State", value=community_visibility_state, inline=True)
+        embed.add_field(name="Profile State", value=profile_state, inline=True)
+        embed.add_field(name="Persona State", value=persona_state, inline=True)
+        embed.add_field(name="\u200b", value="\u200b", inline=False)
+
+        if has_bans:
+            for ban in bans_info:
+                if len(bans_info) == 1:
+                    embed.add_field(name="Name at Ban", value=ban['name_at_ban'], inline=True)
+                    embed.add_field(name="Ban Reason", value=ban['ban_reason'], inline=True)
+                    embed.add_field(name="Ban Timestamp", value=ban['ban_timestamp'], inline=True)
+                    if ban['current_state'] != "Permanent":
+                        embed.add_field(name="Unban Timestamp", value=ban["unban_timestamp"], inline=True)
+                    embed.add_field(name="Server", value=ban['server'], inline=True)
+                    embed.add_field(name="Current State", value=ban['current_state'], inline=True)
+                    if ban["current_state"] == "Unbanned":
+                        embed.add_field(name="Unban Reason", value=ban['unban_reason'], inline=True)
+                    embed.add_field(name="\u200b", value="\u200b", inline=False)
+                else:
+                    embed.add_field(name="Ban #"+str(bans_info.index(ban)+1), value="", inline=False)
+                    embed.add_field(name="Name at Ban", value=ban['name_at_ban'], inline=True)
+                    embed.add_field(name="Ban Reason", value=ban['ban_reason'], inline=True)
+                    embed.add_field(name="Ban Timestamp", value=ban['ban_timestamp'], inline=True)
+                    if ban['current_state'] != "Permanent":
+                        embed.add_field(name="Unban Timestamp", value=ban["unban_timestamp"], inline=True)
+                    embed.add_field(name="Server", value=ban['server'], inline=True)
+                    embed.add_field(name="Current State", value=ban['current_state'], inline=True)
+                    if ban["current_state"] == "Unbanned":
+                        embed.add_field(name="Unban Reason", value=ban['unban_reason'], inline=True)
+                    embed.add_field(name="\u200b", value="\u200b", inline=False)
+
+        embed.set_footer(text=f"Requested by {author.name}", icon_url=author.avatar)
+        return embed
 
     @app_commands.command(
     name="status",
@@ -311,22 +397,83 @@ class SteamTools(commands.Cog, name="steamtools"):
         await status.wait()
 
         # Interaction is still valid after the modal is submitted
-        flagged, map_name, valve_official, players, max_players, hostname = await scrape_status_command(status.status_output)
+        result, flagged, profiles = await self.scrape_status_command(status.status_output)
 
         # Create the embed for the status information
         embed = discord.Embed(
             title="TF2 Status",
-            description=f"Hostname: {hostname}\nMap: {map_name}\nValve Official: {valve_official}\nPlayers: {players}/{max_players}",
+            description=f"Hostname: {result.hostname}\nMap: {result.map_name}\nValve Official: {result.valve_official}\nPlayers: {result.humans}/{result.max_players}",
             color=discord.Color.blue()
         )
-        for steamid in flagged:
-            steamid64 = SteamID(steamid).as_64
-            steam_profile_name = await get_steam_profile_name(steamid64)
-            embed.add_field(name=steam_profile_name, value=f"[SteamHistory](https://steamhistory.net/id/{steamid64})", inline=False)
+        for player in flagged:
+            profile = profiles.get(str(player.steamid64))
+            steam_profile_name = profile['personaname'] if profile else player.name
+            embed.add_field(name=steam_profile_name, value=f"[SteamHistory](https://steamhistory.net/id/{player.steamid64})", inline=False)
         embed.set_footer(text=f"Requested by {interaction.user.name}", icon_url=interaction.user.avatar)
 
         # Send the response as a followup, no need to check if response is done
         await interaction.followup.send(embed=embed)
 
+    @commands.hybrid_command(
+        name="setbanchannel",
+        description="Set the channel to post ban notifications.",
+    )
+    @app_commands.describe(channel="The channel where ban changes of tracked accounts are posted")
+    @commands.has_permissions(manage_guild=True)
+    @commands.guild_only()
+    async def setbanchannel(self, context: Context, channel: discord.TextChannel) -> None:
+        await self.bot.database.set_ban_channel(context.guild.id, channel.id)
+        embed = discord.Embed(
+            description=f"Ban notifications will be posted in {channel.mention}.",
+            color=discord.Color.blue()
+        )
+        await context.send(embed=embed)
+
+    @commands.hybrid_command(
+        name="tracksteam",
+        description="Track a steam user for bans.",
+    )
+    @app_commands.describe(steamid="The SteamID64, SteamID3, SteamID, or profile URL of the account to track")
+    async def tracksteam(self, context: Context, steamid: str) -> None:
+        steamid64 = await self.api.resolve_steamid(steamid)
+        if steamid64 is None:
+            embed = discord.Embed(
+                title="Invalid Steam ID",
+                description="Please enter a valid Steam ID, Steam ID3, Steam ID32, Steam ID64, or Steam profile URL.",
+                color=discord.Color.red()
+            )
+            await context.send(embed=embed)
+            return
+        # Ban changes are announced in the guilds the tracking user shares with the bot
+        tracker = await self.bot.database.track_steam(str(steamid64), context.author.id)
+        if tracker != context.author.id:
+            embed = discord.Embed(
+                description=f"[{steamid64}](https://steamhistory.net/id/{steamid64}) is already tracked by someone else.",
+                color=discord.Color.red()
+            )
+            await context.send(embed=embed)
+            return
+        embed = discord.Embed(
+            description=f"Now tracking [{steamid64}](https://steamhistory.net/id/{steamid64}) for bans.",
+            color=discord.Color.blue()
+        )
+        await context.send(embed=embed)
+
+    @commands.hybrid_command(
+        name="untracksteam",
+        description="Untrack a steam user for bans.",
+    )
+    @app_commands.describe(steamid="The SteamID64, SteamID3, SteamID, or profile URL of the account to untrack")
+    async def untracksteam(self, context: Context, steamid: str) -> None:
+        steamid64 = await self.api.resolve_steamid(steamid)
+        # Only the user tracking an account can untrack it, the bot owner can untrack any
+        tracker = None if await self.bot.is_owner(context.author) else context.author.id
+        removed = await self.bot.database.untrack_steam(str(steamid64), tracker) if steamid64 is not None else 0
+        embed = discord.Embed(
+            description=f"Stopped tracking `{steamid64}`." if removed else f"`{steamid}` is not being tracked by you.",
+            color=discord.Color.blue() if removed else discord.Color.red()
+        )
+        await context.send(embed=embed)
+
 async def setup(bot) -> None:
     await bot.add_cog(SteamTools(bot))
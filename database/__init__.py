@@ -7,13 +7,444 @@ Version: 6.1.0
 """
 
 
+import asyncio
+import json
+import logging
+import re
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Iterable, Optional
+
 import aiosqlite
 
+from database.stats import QueryStats, StatementStats, normalize_statement
 
-class DatabaseManager:
-    def __init__(self, *, connection: aiosqlite.Connection) -> None:
+logger = logging.getLogger("discord_bot.database")
+
+# Tables that can be exported: name -> (table, columns, guild column or None, keyset columns)
+EXPORT_TABLES = {
+    "warns": ("warns", ("server_id", "user_id", "id", "moderator_id", "reason", "created_at"), "server_id", ("user_id", "id")),
+    "steam": ("Steam", ("steam_id", "discord_id"), None, ("steam_id",)),
+    # rj_webhook is left out, a webhook URL is a credential
+    "guildsettings": ("GuildSettings", ("guild_id", "prefix", "autorole_id"), "guild_id", ("guild_id",)),
+}
+
+# Statements EXPLAIN QUERY PLAN has something to say about
+EXPLAINABLE = re.compile(r"^\s*(SELECT|INSERT|UPDATE|DELETE|REPLACE|WITH)\b", re.IGNORECASE)
+
+
+class TimedConnection:
+    """
+    The connection handed out by DatabasePool.read() and DatabasePool.transaction().
+
+    Every statement run through it is timed per normalized statement in the pool's QueryStats.
+    """
+
+    def __init__(self, pool: "DatabasePool", connection: aiosqlite.Connection) -> None:
+        self.pool = pool
         self.connection = connection
 
+    async def fetchone(self, sql: str, parameters: Iterable = ()) -> Optional[tuple]:
+        start = time.perf_counter()
+        async with self.connection.execute(sql, parameters) as cursor:
+            row = await cursor.fetchone()
+        self.pool.record(sql, parameters, start)
+        return row
+
+    async def fetchall(self, sql: str, parameters: Iterable = ()) -> list:
+        start = time.perf_counter()
+        async with self.connection.execute(sql, parameters) as cursor:
+            rows = list(await cursor.fetchall())
+        self.pool.record(sql, parameters, start)
+        return rows
+
+    async def execute(self, sql: str, parameters: Iterable = ()) -> int:
+        """
+        :return: The number of rows changed by the statement.
+        """
+        start = time.perf_counter()
+        async with self.connection.execute(sql, parameters) as cursor:
+            rowcount = cursor.rowcount
+        self.pool.record(sql, parameters, start)
+        return rowcount
+
+    async def executemany(self, sql: str, parameters: Iterable[Iterable]) -> int:
+        """
+        :return: The number of rows changed.
+        """
+        parameters = list(parameters)
+        start = time.perf_counter()
+        before = self.connection.total_changes
+        await self.connection.executemany(sql, parameters)
+        self.pool.record(sql, parameters[0] if parameters else (), start)
+        return self.connection.total_changes - before
+
+
+class DatabasePool:
+    """
+    A set of long-lived aiosqlite connections shared by the whole bot.
+
+    SQLite only allows one writer at a time, so all writes go through a single
+    connection guarded by a lock, while reads are spread over a bounded number
+    of read-only connections. WAL mode lets those readers run alongside the writer.
+
+    Every statement goes through a TimedConnection, statements slower than
+    slow_query_ms are logged together with their query plan.
+    """
+
+    PRAGMAS = (
+        "PRAGMA journal_mode = WAL",
+        "PRAGMA synchronous = NORMAL",
+        "PRAGMA temp_store = MEMORY",
+        "PRAGMA cache_size = -16000",
+        "PRAGMA mmap_size = 134217728",
+        "PRAGMA busy_timeout = 5000",
+    )
+
+    def __init__(
+        self, path: str, *, readers: int = 4, cached_statements: int = 256, slow_query_ms: float = 100.0
+    ) -> None:
+        self.path = path
+        self.reader_count = max(1, readers)
+        self.cached_statements = cached_statements
+        self.writer: Optional[aiosqlite.Connection] = None
+        self._readers: list[aiosqlite.Connection] = []
+        self._idle_readers: Optional[asyncio.Queue] = None
+        self._write_lock = asyncio.Lock()
+        self.stats = QueryStats(slow_query_ms / 1000)
+        self._explain_tasks = set()
+        # Called with the seconds every read, transaction and script took, waiting for a connection included
+        self.observer: Optional[Callable[[float], None]] = None
+
+    def _observe(self, start: float) -> None:
+        if self.observer is not None:
+            self.observer(time.perf_counter() - start)
+
+    def record(self, sql: str, parameters, start: float) -> None:
+        """
+        Records a statement that started at `start`, explaining it in the background if it was slow.
+        """
+        elapsed = time.perf_counter() - start
+        statement, stats = self.stats.record(sql, elapsed)
+        if elapsed < self.stats.slow_threshold:
+            return
+        self.stats.slow_statements += 1
+        if stats.plan is None and EXPLAINABLE.match(sql):
+            task = asyncio.create_task(self._explain(sql, tuple(parameters), elapsed, stats))
+            self._explain_tasks.add(task)
+            task.add_done_callback(self._explain_tasks.discard)
+        else:
+            logger.warning(f"Slow query ({elapsed * 1000:.1f}ms): {statement}\nPlan: {stats.plan or 'n/a'}")
+
+    async def _explain(self, sql: str, parameters: tuple, elapsed: float, stats: StatementStats) -> None:
+        try:
+            connection = await self._idle_readers.get()
+            try:
+                async with connection.execute(f"EXPLAIN QUERY PLAN {sql}", parameters) as cursor:
+                    rows = await cursor.fetchall()
+            finally:
+                self._idle_readers.put_nowait(connection)
+            stats.plan = "; ".join(row[-1] for row in rows) or "no plan"
+        except Exception as e:
+            stats.plan = f"unavailable ({type(e).__name__}: {e})"
+        logger.warning(f"Slow query ({elapsed * 1000:.1f}ms): {normalize_statement(sql)}\nPlan: {stats.plan}")
+
+    async def _connect(self, *, read_only: bool) -> aiosqlite.Connection:
+        # isolation_level=None puts sqlite3 in autocommit mode, transactions are explicit
+        connection = await aiosqlite.connect(
+            self.path, isolation_level=None, cached_statements=self.cached_statements
+        )
+        for pragma in self.PRAGMAS:
+            await connection.execute(pragma)
+        if read_only:
+            await connection.execute("PRAGMA query_only = ON")
+        return connection
+
+    async def open(self) -> None:
+        """
+        Opens the writer connection and the reader connections.
+        """
+        self.writer = await self._connect(read_only=False)
+        self._idle_readers = asyncio.Queue()
+        for _ in range(self.reader_count):
+            reader = await self._connect(read_only=True)
+            self._readers.append(reader)
+            self._idle_readers.put_nowait(reader)
+
+    async def close(self) -> None:
+        """
+        Closes every connection of the pool.
+        """
+        for task in list(self._explain_tasks):
+            task.cancel()
+        for reader in self._readers:
+            await reader.close()
+        self._readers.clear()
+        if self.writer is not None:
+            await self.writer.close()
+            self.writer = None
+
+    @asynccontextmanager
+    async def read(self) -> AsyncIterator[TimedConnection]:
+        """
+        Borrows a read-only connection, waiting if all of them are in use.
+        """
+        start = time.perf_counter()
+        connection = await self._idle_readers.get()
+        try:
+            yield TimedConnection(self, connection)
+        finally:
+            self._idle_readers.put_nowait(connection)
+            self._observe(start)
+
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator[TimedConnection]:
+        """
+        Runs the body inside a write transaction on the writer connection.
+        The transaction is committed on success and rolled back on error.
+        """
+        start = time.perf_counter()
+        try:
+            async with self._write_lock:
+                connection = TimedConnection(self, self.writer)
+                await connection.execute("BEGIN IMMEDIATE")
+                try:
+                    yield connection
+                except BaseException:
+                    await connection.execute("ROLLBACK")
+                    raise
+                else:
+                    await connection.execute("COMMIT")
+        finally:
+            self._observe(start)
+
+    async def fetchone(self, sql: str, parameters: Iterable = ()) -> Optional[tuple]:
+        async with self.read() as connection:
+            return await connection.fetchone(sql, parameters)
+
+    async def fetchall(self, sql: str, parameters: Iterable = ()) -> list:
+        async with self.read() as connection:
+            return await connection.fetchall(sql, parameters)
+
+    async def execute(self, sql: str, parameters: Iterable = ()) -> int:
+        """
+        Runs a single write statement in its own transaction.
+
+        :return: The number of rows changed by the statement.
+        """
+        async with self.transaction() as connection:
+            return await connection.execute(sql, parameters)
+
+    async def executemany(self, sql: str, parameters: Iterable[Iterable]) -> int:
+        """
+        Runs a write statement for every set of parameters in one transaction.
+
+        :return: The number of rows changed.
+        """
+        async with self.transaction() as connection:
+            return await connection.executemany(sql, parameters)
+
+
+class DatabaseManager:
+    def __init__(self, *, pool: DatabasePool) -> None:
+        self.pool = pool
+
+    async def close(self) -> None:
+        await self.pool.close()
+
+    async def get_guild_prefix(self, guild_id: int) -> Optional[str]:
+        row = await self.pool.fetchone(
+            "SELECT prefix FROM GuildSettings WHERE guild_id = ?", (guild_id,)
+        )
+        return row[0] if row else None
+
+    async def set_guild_prefix(self, guild_id: int, prefix: str) -> None:
+        # An upsert, guilds joined since the last bootstrap may not have a row yet
+        await self.pool.execute(
+            "INSERT INTO GuildSettings (guild_id, prefix) VALUES (?, ?) "
+            "ON CONFLICT (guild_id) DO UPDATE SET prefix = excluded.prefix",
+            (guild_id, prefix),
+        )
+
+    async def get_guild_prefixes(self) -> list:
+        return await self.pool.fetchall(
+            "SELECT guild_id, prefix FROM GuildSettings WHERE prefix IS NOT NULL"
+        )
+
+    async def bootstrap_guilds(self, guild_ids: Iterable[int], prefix: str) -> int:
+        """
+        Makes sure every given guild has a GuildSettings row with a prefix, in one transaction.
+
+        :param guild_ids: The IDs of the guilds to bootstrap.
+        :param prefix: The prefix to give guilds that have none yet.
+        :return: The number of rows inserted or updated.
+        """
+        return await self.pool.executemany(
+            "INSERT INTO GuildSettings (guild_id, prefix) VALUES (?, ?) "
+            "ON CONFLICT (guild_id) DO UPDATE SET prefix = excluded.prefix WHERE GuildSettings.prefix IS NULL",
+            ((guild_id, prefix) for guild_id in guild_ids),
+        )
+
+    async def get_guild_autorole(self, guild_id: int) -> Optional[int]:
+        row = await self.pool.fetchone(
+            "SELECT autorole_id FROM GuildSettings WHERE guild_id = ?", (guild_id,)
+        )
+        return row[0] if row else None
+
+    async def set_guild_autorole(self, guild_id: int, role_id: int) -> None:
+        await self.pool.execute(
+            "UPDATE GuildSettings SET autorole_id = ? WHERE guild_id = ?", (role_id, guild_id)
+        )
+
+    async def get_steam_cache(self) -> list:
+        return await self.pool.fetchall(
+            "SELECT kind, steam_id, payload, expires_at FROM SteamCache WHERE expires_at > ?",
+            (time.time(),),
+        )
+
+    async def save_steam_cache(self, rows: Iterable[tuple]) -> None:
+        """
+        Upserts (kind, steam_id, payload, expires_at) cache rows and drops expired ones.
+        """
+        async with self.pool.transaction() as connection:
+            await connection.executemany(
+                "INSERT INTO SteamCache (kind, steam_id, payload, expires_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (kind, steam_id) DO UPDATE SET payload = excluded.payload, expires_at = excluded.expires_at",
+                rows,
+            )
+            await connection.execute("DELETE FROM SteamCache WHERE expires_at <= ?", (time.time(),))
+
+    async def clear_steam_cache(self) -> None:
+        await self.pool.execute("DELETE FROM SteamCache")
+
+    async def track_steam(self, steam_id: str, discord_id: int) -> int:
+        """
+        Tracks an account for a user, an account already tracked by someone else is left to them.
+
+        :return: The Discord ID of the user tracking the account.
+        """
+        async with self.pool.transaction() as connection:
+            await connection.execute(
+                "INSERT INTO Steam (steam_id, discord_id) VALUES (?, ?) ON CONFLICT (steam_id) DO NOTHING",
+                (steam_id, discord_id),
+            )
+            row = await connection.fetchone("SELECT discord_id FROM Steam WHERE steam_id = ?", (steam_id,))
+            return row[0]
+
+    async def untrack_steam(self, steam_id: str, discord_id: Optional[int]) -> int:
+        """
+        Stops tracking an account.
+
+        :param discord_id: The user that tracks the account, or None to untrack it whoever tracks it.
+        :return: The number of rows removed from Steam.
+        """
+        async with self.pool.transaction() as connection:
+            if discord_id is None:
+                removed = await connection.execute("DELETE FROM Steam WHERE steam_id = ?", (steam_id,))
+            else:
+                removed = await connection.execute(
+                    "DELETE FROM Steam WHERE steam_id = ? AND discord_id = ?", (steam_id, discord_id)
+                )
+            if removed:
+                await connection.execute("DELETE FROM SteamBanState WHERE steam_id = ?", (steam_id,))
+            return removed
+
+    async def count_tracked_steam_ids(self) -> int:
+        row = await self.pool.fetchone("SELECT COUNT(*) FROM Steam")
+        return row[0]
+
+    async def get_tracked_steam_ids(self, after: str, limit: int) -> list:
+        """
+        Returns one page of tracked Steam accounts, ordered by SteamID.
+
+        :param after: The last SteamID of the previous page, an empty string for the first page.
+        :param limit: The size of the page.
+        :return: A list of (steam_id, discord_id) rows.
+        """
+        return await self.pool.fetchall(
+            "SELECT steam_id, discord_id FROM Steam WHERE steam_id > ? ORDER BY steam_id LIMIT ?",
+            (after, limit),
+        )
+
+    async def get_ban_states(self, steam_ids: list) -> dict:
+        if not steam_ids:
+            return {}
+        placeholders = ", ".join("?" * len(steam_ids))
+        rows = await self.pool.fetchall(
+            f"SELECT steam_id, state FROM SteamBanState WHERE steam_id IN ({placeholders})",
+            steam_ids,
+        )
+        return {steam_id: json.loads(state) for steam_id, state in rows}
+
+    async def save_ban_states(self, states: dict) -> None:
+        now = time.time()
+        await self.pool.executemany(
+            "INSERT INTO SteamBanState (steam_id, state, updated_at) VALUES (?, ?, ?) "
+            "ON CONFLICT (steam_id) DO UPDATE SET state = excluded.state, updated_at = excluded.updated_at",
+            ((steam_id, json.dumps(state), now) for steam_id, state in states.items()),
+        )
+
+    async def get_ban_history(self, steam_id) -> list:
+        """
+        Returns the stored SourceBans records of a player, oldest first, shaped like SteamHistory's records.
+        """
+        rows = await self.pool.fetchall(
+            "SELECT name_at_ban, ban_reason, ban_timestamp, unban_timestamp, unban_reason, server, current_state "
+            "FROM SteamBanHistory WHERE steam_id = ? ORDER BY ban_timestamp",
+            (str(steam_id),),
+        )
+        return [
+            {
+                "SteamID": str(steam_id),
+                "Name": name_at_ban,
+                "BanReason": ban_reason,
+                "BanTimestamp": ban_timestamp,
+                "UnbanTimestamp": unban_timestamp,
+                "UnbanReason": unban_reason,
+                "Server": server,
+                "CurrentState": current_state,
+            }
+            for name_at_ban, ban_reason, ban_timestamp, unban_timestamp, unban_reason, server, current_state in rows
+        ]
+
+    async def merge_ban_history(self, bans: dict) -> int:
+        """
+        Stores SourceBans records, leaving the ones that did not change untouched.
+
+        :param bans: A dict mapping SteamID64s to their list of SteamHistory records.
+        :return: The number of records that were new or changed.
+        """
+        now = time.time()
+        return await self.pool.executemany(
+            "INSERT INTO SteamBanHistory (steam_id, ban_timestamp, server, name_at_ban, ban_reason, unban_reason, "
+            "unban_timestamp, current_state, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (steam_id, ban_timestamp, server) DO UPDATE SET name_at_ban = excluded.name_at_ban, "
+            "ban_reason = excluded.ban_reason, unban_reason = excluded.unban_reason, "
+            "unban_timestamp = excluded.unban_timestamp, current_state = excluded.current_state, "
+            "updated_at = excluded.updated_at "
+            "WHERE name_at_ban IS NOT excluded.name_at_ban OR ban_reason IS NOT excluded.ban_reason "
+            "OR unban_reason IS NOT excluded.unban_reason OR unban_timestamp IS NOT excluded.unban_timestamp "
+            "OR current_state IS NOT excluded.current_state",
+            (
+                (
+                    str(steam_id), ban['BanTimestamp'], ban['Server'], ban['Name'], ban['BanReason'],
+                    ban['UnbanReason'], ban['UnbanTimestamp'] or 0, ban['CurrentState'], now,
+                )
+                for steam_id, player_bans in bans.items()
+                for ban in player_bans
+            ),
+        )
+
+    async def set_ban_channel(self, guild_id: int, channel_id: int) -> None:
+        await self.pool.execute(
+            "INSERT INTO SteamBanChannels (guild_id, channel_id) VALUES (?, ?) "
+            "ON CONFLICT (guild_id) DO UPDATE SET channel_id = excluded.channel_id",
+            (guild_id, channel_id),
+        )
+
+    async def get_ban_channels(self) -> dict:
+        return dict(await self.pool.fetchall("SELECT guild_id, channel_id FROM SteamBanChannels"))
+
     async def add_warn(
         self, user_id: int, server_id: int, moderator_id: int, reason: str
     ) -> int:
@@ -22,29 +453,38 @@ class DatabaseManager:
 
         :param user_id: The ID of the user that should be warned.
         :param reason: The reason why the user should be warned.
+        :return: The ID of the new warn.
+        """
+        async with self.pool.transaction() as connection:
+            return await self._insert_warn(connection, user_id, server_id, moderator_id, reason)
+
+    async def add_warns(self, warns: Iterable[tuple]) -> list[int]:
         """
-        rows = await self.connection.execute(
-            "SELECT id FROM warns WHERE user_id=? AND server_id=? ORDER BY id DESC LIMIT 1",
+        Adds many warns in one transaction.
+
+        :param warns: (user_id, server_id, moderator_id, reason) tuples.
+        :return: The IDs of the new warns, in the same order.
+        """
+        async with self.pool.transaction() as connection:
+            return [await self._insert_warn(connection, *warn) for warn in warns]
+
+    @staticmethod
+    async def _insert_warn(connection, user_id: int, server_id: int, moderator_id: int, reason: str) -> int:
+        # The next ID is allocated by the INSERT itself, so concurrent warns of a user can't get the same one
+        row = await connection.fetchone(
+            "INSERT INTO warns(id, user_id, server_id, moderator_id, reason) "
+            "SELECT COALESCE(MAX(id), 0) + 1, ?, ?, ?, ? FROM warns WHERE server_id=? AND user_id=? "
+            "RETURNING id",
             (
                 user_id,
                 server_id,
+                moderator_id,
+                reason,
+                server_id,
+                user_id,
             ),
         )
-        async with rows as cursor:
-            result = await cursor.fetchone()
-            warn_id = result[0] + 1 if result is not None else 1
-            await self.connection.execute(
-                "INSERT INTO warns(id, user_id, server_id, moderator_id, reason) VALUES (?, ?, ?, ?, ?)",
-                (
-                    warn_id,
-                    user_id,
-                    server_id,
-                    moderator_id,
-                    reason,
-                ),
-            )
-            await self.connection.commit()
-            return warn_id
+        return row[0]
 
     async def remove_warn(self, warn_id: int, user_id: int, server_id: int) -> int:
         """
@@ -54,44 +494,96 @@ class DatabaseManager:
         :param user_id: The ID of the user that was warned.
         :param server_id: The ID of the server where the user has been warned
         """
-        await self.connection.execute(
-            "DELETE FROM warns WHERE id=? AND user_id=? AND server_id=?",
-            (
-                warn_id,
-                user_id,
-                server_id,
-            ),
-        )
-        await self.connection.commit()
-        rows = await self.connection.execute(
-            "SELECT COUNT(*) FROM warns WHERE user_id=? AND server_id=?",
-            (
-                user_id,
-                server_id,
-            ),
-        )
-        async with rows as cursor:
-            result = await cursor.fetchone()
+        async with self.pool.transaction() as connection:
+            await connection.execute(
+                "DELETE FROM warns WHERE id=? AND user_id=? AND server_id=?",
+                (
+                    warn_id,
+                    user_id,
+                    server_id,
+                ),
+            )
+            result = await connection.fetchone(
+                "SELECT COUNT(*) FROM warns WHERE user_id=? AND server_id=?",
+                (
+                    user_id,
+                    server_id,
+                ),
+            )
             return result[0] if result is not None else 0
 
-    async def get_warnings(self, user_id: int, server_id: int) -> list:
+    async def get_warnings(
+        self, user_id: int, server_id: int, *, page_size: int = 500
+    ) -> AsyncIterator[tuple]:
         """
-        This function will get all the warnings of a user.
+        This function will get all the warnings of a user, oldest first.
+
+        Rows are read a page at a time, continuing after the last ID seen, so a user with
+        thousands of warnings never holds a reader connection or the whole list at once.
 
         :param user_id: The ID of the user that should be checked.
         :param server_id: The ID of the server that should be checked.
-        :return: A list of all the warnings of the user.
+        :param page_size: How many warnings are read per query.
+        :return: An async iterator of (user_id, server_id, moderator_id, reason, created_at, id) rows.
         """
-        rows = await self.connection.execute(
-            "SELECT user_id, server_id, moderator_id, reason, strftime('%s', created_at), id FROM warns WHERE user_id=? AND server_id=?",
-            (
-                user_id,
-                server_id,
-            ),
+        last_id = 0
+        while True:
+            rows = await self.pool.fetchall(
+                "SELECT user_id, server_id, moderator_id, reason, strftime('%s', created_at), id FROM warns "
+                "WHERE server_id=? AND user_id=? AND id>? ORDER BY id LIMIT ?",
+                (
+                    server_id,
+                    user_id,
+                    last_id,
+                    page_size,
+                ),
+            )
+            for row in rows:
+                yield row
+            if len(rows) < page_size:
+                return
+            last_id = rows[-1][5]
+
+    async def clear_warns(self, server_id: int, user_ids: Iterable[int]) -> int:
+        """
+        Removes every warn of the given users of a server in one transaction.
+
+        :return: The number of warns removed.
+        """
+        return await self.pool.executemany(
+            "DELETE FROM warns WHERE server_id=? AND user_id=?",
+            ((server_id, user_id) for user_id in user_ids),
         )
-        async with rows as cursor:
-            result = await cursor.fetchall()
-            result_list = []
-            for row in result:
-                result_list.append(row)
-            return result_list
+
+    async def export_rows(self, name: str, guild_id: Optional[int] = None, *, page_size: int = 500) -> AsyncIterator[tuple]:
+        """
+        Streams the rows of an exportable table a page at a time, with keyset pagination.
+
+        :param name: A key of EXPORT_TABLES.
+        :param guild_id: Only export the rows of this guild, for tables that have a guild column.
+        :param page_size: How many rows are read per query.
+        :return: An async iterator of rows, with the columns listed in EXPORT_TABLES.
+        """
+        table, columns, guild_column, keyset = EXPORT_TABLES[name]
+        select = f"SELECT {', '.join(columns)} FROM {table}"
+        conditions, parameters = [], []
+        if guild_column is not None and guild_id is not None:
+            conditions.append(f"{guild_column} = ?")
+            parameters.append(guild_id)
+        key_indexes = [columns.index(column) for column in keyset]
+        last_key = None
+        while True:
+            page_conditions = list(conditions)
+            page_parameters = list(parameters)
+            if last_key is not None:
+                page_conditions.append(f"({', '.join(keyset)}) > ({', '.join('?' * len(keyset))})")
+                page_parameters.extend(last_key)
+            where = f" WHERE {' AND '.join(page_conditions)}" if page_conditions else ""
+            rows = await self.pool.fetchall(
+                f"{select}{where} ORDER BY {', '.join(keyset)} LIMIT ?", (*page_parameters, page_size)
+            )
+            for row in rows:
+                yield row
+            if len(rows) < page_size:
+                return
+            last_key = [rows[-1][index] for index in key_indexes]
@@ -0,0 +1,150 @@
+"""
+Numbered schema migrations, tracked with PRAGMA user_version.
+
+Each migration runs once, in its own transaction together with the version bump,
+so a failed migration leaves the database at the previous version. On a database
+that is up to date, migrate() only reads the pragma.
+"""
+
+import logging
+from typing import Awaitable, Callable, NamedTuple, Union
+
+from database import DatabasePool, TimedConnection
+
+logger = logging.getLogger("discord_bot.database")
+
+# A statement, or a function for steps that have to look at the database first
+Step = Union[str, Callable[[TimedConnection], Awaitable[None]]]
+
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    steps: tuple[Step, ...]
+
+
+async def _add_autorole_id(connection: TimedConnection) -> None:
+    # ALTER TABLE has no IF NOT EXISTS, databases the column was added to by hand are skipped
+    columns = await connection.fetchall("PRAGMA table_info(GuildSettings)")
+    if "autorole_id" not in {column[1] for column in columns}:
+        await connection.execute("ALTER TABLE GuildSettings ADD COLUMN autorole_id INTEGER")
+
+
+MIGRATIONS = (
+    # The schema before versioning, databases created by it start at version 0 and go through IF NOT EXISTS
+    Migration(1, "baseline", (
+        """
+        CREATE TABLE IF NOT EXISTS GuildSettings
+        (
+            guild_id             INTEGER PRIMARY KEY,
+            prefix               TEXT,
+            rj_webhook           TEXT
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS Steam
+        (
+            steam_id             TEXT PRIMARY KEY,
+            discord_id           INTEGER
+        )
+        """,
+    )),
+    Migration(2, "GuildSettings.autorole_id", (_add_autorole_id,)),
+    Migration(3, "Steam cache and ban tables", (
+        """
+        CREATE TABLE IF NOT EXISTS SteamCache
+        (
+            kind                 TEXT NOT NULL,
+            steam_id             TEXT NOT NULL,
+            payload              TEXT NOT NULL,
+            expires_at           REAL NOT NULL,
+            PRIMARY KEY (kind, steam_id)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS SteamBanState
+        (
+            steam_id             TEXT PRIMARY KEY,
+            state                TEXT NOT NULL,
+            updated_at           REAL NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS SteamBanChannels
+        (
+            guild_id             INTEGER PRIMARY KEY,
+            channel_id           INTEGER NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS SteamBanHistory
+        (
+            steam_id             TEXT NOT NULL,
+            ban_timestamp        INTEGER NOT NULL,
+            server               TEXT NOT NULL,
+            name_at_ban          TEXT,
+            ban_reason           TEXT,
+            unban_reason         TEXT,
+            unban_timestamp      INTEGER NOT NULL DEFAULT 0,
+            current_state        TEXT,
+            updated_at           REAL NOT NULL,
+            PRIMARY KEY (steam_id, ban_timestamp, server)
+        )
+        """,
+    )),
+    Migration(4, "warns", (
+        """
+        CREATE TABLE IF NOT EXISTS warns
+        (
+            id                   INTEGER NOT NULL,
+            user_id              INTEGER NOT NULL,
+            server_id            INTEGER NOT NULL,
+            moderator_id         INTEGER NOT NULL,
+            reason               TEXT NOT NULL,
+            created_at           TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+    )),
+    Migration(5, "indexes", (
+        # Warn IDs count up per user and server, this also serves every lookup and the keyset pagination
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_warns_server_user ON warns (server_id, user_id, id)",
+        # The cache warm up reads the unexpired entries and the flush deletes the expired ones
+        "CREATE INDEX IF NOT EXISTS idx_steamcache_expires ON SteamCache (expires_at)",
+        # The primary key starts with steam_id, lookups of the bans of a server need their own index
+        "CREATE INDEX IF NOT EXISTS idx_steambanhistory_server ON SteamBanHistory (server)",
+    )),
+)
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+async def migrate(pool: DatabasePool, migrations: tuple[Migration, ...] = MIGRATIONS) -> list[Migration]:
+    """
+    Brings the database up to the latest version.
+
+    :param pool: The pool of the database to migrate.
+    :param migrations: The migrations, ordered by version.
+    :return: The migrations that were applied.
+    """
+    row = await pool.fetchone("PRAGMA user_version")
+    if row[0] >= migrations[-1].version:
+        return []
+    applied = []
+    for migration in migrations:
+        if migration.version <= row[0]:
+            continue
+        async with pool.transaction() as connection:
+            # Read again under the write lock, another process may have migrated in the meantime
+            current = (await connection.fetchone("PRAGMA user_version"))[0]
+            if migration.version <= current:
+                continue
+            for step in migration.steps:
+                if isinstance(step, str):
+                    await connection.execute(step)
+                else:
+                    await step(connection)
+            # Pragmas do not take parameters, the version is an int from the list above
+            await connection.execute(f"PRAGMA user_version = {int(migration.version)}")
+        logger.info(f"Applied database migration {migration.version}: {migration.description}")
+        applied.append(migration)
+    return applied
@@ -0,0 +1,76 @@
+import re
+from functools import lru_cache
+from typing import Optional
+
+# Statements kept apart at most, the rest are counted together so the table stays bounded
+MAX_STATEMENTS = 500
+OTHER_STATEMENTS = "<other statements>"
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDERS = re.compile(r"\?(?:\s*,\s*\?)+")
+_VALUES = re.compile(r"\(\?, \.\.\.\)(?:\s*,\s*\(\?, \.\.\.\))+|\(\?\)(?:\s*,\s*\(\?\))+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+# The SQL strings are almost all constants, so each shape is only worked out once
+@lru_cache(maxsize=MAX_STATEMENTS)
+def normalize_statement(sql: str) -> str:
+    """
+    Reduces a statement to its shape, so statements that only differ in their literals,
+    the length of their IN lists or their whitespace are counted together.
+    """
+    sql = _STRING.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _WHITESPACE.sub(" ", sql).strip()
+    sql = _PLACEHOLDERS.sub("?, ...", sql)
+    return _VALUES.sub("(?, ...), ...", sql)
+
+
+class StatementStats:
+    __slots__ = ("count", "total", "max", "plan")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        # The EXPLAIN QUERY PLAN of the statement, captured the first time it was slow
+        self.plan: Optional[str] = None
+
+    @property
+    def average(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+
+class QueryStats:
+    """
+    Count, total and max execution time of every normalized statement run through the DatabasePool.
+    """
+
+    def __init__(self, slow_threshold: float = 0.1) -> None:
+        # Statements slower than this many seconds are logged with their query plan
+        self.slow_threshold = slow_threshold
+        self.statements: dict[str, StatementStats] = {}
+        self.slow_statements = 0
+
+    def record(self, sql: str, seconds: float) -> tuple[str, StatementStats]:
+        statement = normalize_statement(sql)
+        stats = self.statements.get(statement)
+        if stats is None:
+            if len(self.statements) >= MAX_STATEMENTS:
+                statement = OTHER_STATEMENTS
+                stats = self.statements.setdefault(statement, StatementStats())
+            else:
+                stats = self.statements[statement] = StatementStats()
+        stats.count += 1
+        stats.total += seconds
+        if seconds > stats.max:
+            stats.max = seconds
+        return statement, stats
+
+    def top(self, count: int = 10) -> list[tuple[str, StatementStats]]:
+        return sorted(self.statements.items(), key=lambda item: item[1].total, reverse=True)[:count]
+
+    def reset(self) -> None:
+        self.statements.clear()
+        self.slow_statements = 0
@@ -0,0 +1,93 @@
+"""
+Upgrades a database created by the schema.sql that predates the migrations.
+
+Run it from the repository root:
+
+    python -m unittest tests.test_migrations
+"""
+
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from database import DatabaseManager, DatabasePool
+from database.migrations import LATEST_VERSION, MIGRATIONS, Migration, migrate
+
+# database/schema.sql before the migrations, databases created by it are at user_version 0
+BASELINE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS GuildSettings
+(
+    guild_id             INTEGER PRIMARY KEY,
+    prefix               TEXT,
+    rj_webhook           TEXT
+);
+
+CREATE TABLE IF NOT EXISTS Steam
+(
+    steam_id             TEXT PRIMARY KEY,
+    discord_id           INTEGER
+);
+"""
+
+GUILD_ID = 1240320839719719025
+
+
+class MigrationTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        path = os.path.join(self.directory.name, "database.db")
+        connection = sqlite3.connect(path)
+        connection.executescript(BASELINE_SCHEMA)
+        connection.execute("INSERT INTO GuildSettings (guild_id, prefix) VALUES (?, ?)", (GUILD_ID, "!"))
+        connection.commit()
+        connection.close()
+        self.pool = DatabasePool(path, readers=1)
+        await self.pool.open()
+        self.database = DatabaseManager(pool=self.pool)
+
+    async def asyncTearDown(self) -> None:
+        await self.pool.close()
+        self.directory.cleanup()
+
+    async def user_version(self) -> int:
+        return (await self.pool.fetchone("PRAGMA user_version"))[0]
+
+    async def test_upgrades_the_baseline(self) -> None:
+        self.assertEqual(await self.user_version(), 0)
+        applied = await migrate(self.pool)
+        self.assertEqual([migration.version for migration in applied], [1, 2, 3, 4, 5])
+        self.assertEqual(await self.user_version(), LATEST_VERSION)
+
+        # The existing row is kept and the new column can be used
+        self.assertEqual(await self.database.get_guild_prefix(GUILD_ID), "!")
+        self.assertIsNone(await self.database.get_guild_autorole(GUILD_ID))
+        await self.database.set_guild_autorole(GUILD_ID, 42)
+        self.assertEqual(await self.database.get_guild_autorole(GUILD_ID), 42)
+
+        self.assertEqual(await self.database.add_warn(1, GUILD_ID, 2, "First"), 1)
+        self.assertEqual(await self.database.add_warn(1, GUILD_ID, 2, "Second"), 2)
+        warnings = [warning async for warning in self.database.get_warnings(1, GUILD_ID)]
+        self.assertEqual([warning[3] for warning in warnings], ["First", "Second"])
+
+    async def test_up_to_date_database_is_left_alone(self) -> None:
+        await migrate(self.pool)
+        self.assertEqual(await migrate(self.pool), [])
+        self.assertEqual(await self.user_version(), LATEST_VERSION)
+
+    async def test_failed_migration_is_rolled_back(self) -> None:
+        await migrate(self.pool)
+        broken = Migration(LATEST_VERSION + 1, "broken", (
+            "CREATE TABLE half_done (id INTEGER)",
+            "SELECT missing_column FROM missing_table",
+        ))
+        with self.assertRaises(sqlite3.OperationalError):
+            await migrate(self.pool, MIGRATIONS + (broken,))
+        self.assertEqual(await self.user_version(), LATEST_VERSION)
+        self.assertIsNone(
+            await self.pool.fetchone("SELECT name FROM sqlite_master WHERE name = 'half_done'")
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Iterator, Optional
+
+# Returned by TTLCache.get() when a key is not cached, since None can be a cached value
+MISSING = object()
+
+
+class TTLCache:
+    """
+    An in-memory LRU cache where every entry also expires after its own time to live.
+    """
+
+    def __init__(self, maxsize: int = 10000) -> None:
+        self.maxsize = maxsize
+        self._entries: OrderedDict[Hashable, tuple[Any, float]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Any:
+        """
+        Returns the cached value of a key, or MISSING if it is not cached or has expired.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return MISSING
+        value, expires_at = entry
+        if expires_at <= time.time():
+            del self._entries[key]
+            self.misses += 1
+            return MISSING
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: float, *, expires_at: Optional[float] = None) -> None:
+        """
+        Caches a value for `ttl` seconds, evicting the least recently used entry when full.
+
+        :param expires_at: An absolute expiry timestamp to use instead of the TTL.
+        """
+        self._entries[key] = (value, expires_at if expires_at is not None else time.time() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def items(self) -> Iterator[tuple[Hashable, Any, float]]:
+        """
+        Yields (key, value, expires_at) for every entry that has not expired yet.
+        """
+        now = time.time()
+        for key, (value, expires_at) in list(self._entries.items()):
+            if expires_at > now:
+                yield key, value, expires_at
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
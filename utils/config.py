@@ -0,0 +1,172 @@
+"""
+The bot configuration, read from config.json.
+
+Readers get an immutable snapshot that is swapped as a whole, so they never need a
+lock. Edits of the file are picked up by polling its modification time, and writes
+go to a temporary file in a worker thread that then replaces config.json, so a
+crash mid-write never leaves a truncated config behind.
+"""
+
+import asyncio
+import copy
+import inspect
+import json
+import logging
+import os
+import tempfile
+from types import MappingProxyType
+from typing import Any, Callable, Mapping, Optional
+
+logger = logging.getLogger("discord_bot.config")
+
+# Called with the previous and the new snapshot, may be a coroutine function
+Subscriber = Callable[[Mapping[str, Any], Mapping[str, Any]], Any]
+
+
+def _file_state(path: str) -> tuple[int, int]:
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _read(path: str) -> tuple[dict, tuple[int, int]]:
+    state = _file_state(path)
+    with open(path, encoding="utf-8") as file:
+        return json.load(file), state
+
+
+def _write(path: str, config: dict) -> tuple[int, int]:
+    directory = os.path.dirname(os.path.abspath(path))
+    descriptor, temporary = tempfile.mkstemp(prefix=".config-", suffix=".json", dir=directory)
+    try:
+        with os.fdopen(descriptor, "w", encoding="utf-8") as file:
+            json.dump(config, file, indent=4)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, path)
+    except BaseException:
+        os.remove(temporary)
+        raise
+    return _file_state(path)
+
+
+class ConfigService:
+    def __init__(self, path: str, config: dict, state: Optional[tuple[int, int]] = None, *, poll_interval: float = 5.0) -> None:
+        self.path = path
+        self.poll_interval = poll_interval
+        self._snapshot = MappingProxyType(config)
+        # (mtime, size) of the file the snapshot was read from or written to
+        self._state = state
+        # The state of a file that could not be parsed, so it is only reported once
+        self._failed_state: Optional[tuple[int, int]] = None
+        self._subscribers: list[Subscriber] = []
+        self._write_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.reloads = 0
+
+    @classmethod
+    def load(cls, path: str, **kwargs) -> "ConfigService":
+        """
+        Reads the config synchronously, for the start of the bot before the event loop runs.
+        """
+        config, state = _read(path)
+        return cls(path, config, state, **kwargs)
+
+    @property
+    def snapshot(self) -> Mapping[str, Any]:
+        """
+        The current config, read-only. Hold on to it to read several keys consistently.
+        """
+        return self._snapshot
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self._snapshot.get(key, default)
+
+    def copy(self) -> dict:
+        """
+        Returns a mutable deep copy of the current config, to edit and pass to save().
+        """
+        return copy.deepcopy(dict(self._snapshot))
+
+    def subscribe(self, callback: Subscriber) -> None:
+        """
+        Calls the callback with the previous and the new snapshot after every reload or save.
+        Callbacks run while the config is locked, so they must not call save() themselves.
+        """
+        self._subscribers.append(callback)
+
+    def unsubscribe(self, callback: Subscriber) -> None:
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+
+    def start(self) -> None:
+        """
+        Starts polling the file for changes made outside of the bot.
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self._poll(), name="config-poll")
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def save(self, config: dict) -> None:
+        """
+        Writes the config to disk and makes it the current snapshot.
+        """
+        config = copy.deepcopy(config)
+        async with self._write_lock:
+            state = await asyncio.to_thread(_write, self.path, config)
+            # Recorded before the next poll, so the bot's own write is not picked up as an edit
+            self._state = state
+            await self._swap(config)
+
+    async def update(self, **changes: Any) -> None:
+        """
+        Sets the given top-level keys and saves the config.
+        """
+        config = self.copy()
+        config.update(changes)
+        await self.save(config)
+
+    async def reload(self) -> bool:
+        """
+        Reads the file again if it changed since the last read or write.
+
+        :return: Whether a new snapshot was loaded.
+        """
+        async with self._write_lock:
+            state = None
+            try:
+                state = await asyncio.to_thread(_file_state, self.path)
+                if state == self._state or state == self._failed_state:
+                    return False
+                config, state = await asyncio.to_thread(_read, self.path)
+            except FileNotFoundError:
+                return False
+            except (OSError, ValueError) as error:
+                # Most likely caught mid-edit, the next change of the file is tried again
+                self._failed_state = state
+                logger.warning(f"Could not reload {self.path}, keeping the current config: {error}")
+                return False
+            self._state = state
+            self.reloads += 1
+            await self._swap(config)
+        logger.info(f"Reloaded {self.path}")
+        return True
+
+    async def _swap(self, config: dict) -> None:
+        previous = self._snapshot
+        self._snapshot = MappingProxyType(config)
+        for callback in list(self._subscribers):
+            try:
+                result = callback(previous, self._snapshot)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception:
+                logger.exception(f"Config subscriber {callback!r} failed")
+
+    async def _poll(self) -> None:
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            await self.reload()
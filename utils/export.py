@@ -0,0 +1,54 @@
+"""
+Encodes rows streamed from the database into CSV or JSON lines files, a chunk at a time.
+"""
+
+import asyncio
+import csv
+import io
+import json
+from typing import AsyncIterator, Sequence
+
+FORMATS = ("csv", "jsonl")
+
+
+async def write_export(rows: AsyncIterator[tuple], columns: Sequence[str], export_format: str, file, *, chunk_rows: int = 500) -> int:
+    """
+    Writes rows to an open text file, encoding `chunk_rows` rows in memory at most and
+    writing each chunk from a worker thread, so the event loop never waits on the disk.
+
+    :param rows: The rows to export.
+    :param columns: The column names, written as the CSV header or used as the JSON keys.
+    :param export_format: "csv" or "jsonl".
+    :param file: A text file opened for writing.
+    :return: The number of rows written.
+    """
+    if export_format not in FORMATS:
+        raise ValueError(f"Unknown export format {export_format!r}, expected one of {', '.join(FORMATS)}")
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if export_format == "csv" else None
+    if writer is not None:
+        writer.writerow(columns)
+    count = 0
+    pending = 0
+    async for row in rows:
+        if writer is not None:
+            writer.writerow(row)
+        else:
+            buffer.write(json.dumps(dict(zip(columns, row)), ensure_ascii=False))
+            buffer.write("\n")
+        count += 1
+        pending += 1
+        if pending >= chunk_rows:
+            await _flush(buffer, file)
+            pending = 0
+    await _flush(buffer, file)
+    await asyncio.to_thread(file.flush)
+    return count
+
+
+async def _flush(buffer: io.StringIO, file) -> None:
+    chunk = buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    if chunk:
+        await asyncio.to_thread(file.write, chunk)
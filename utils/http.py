@@ -0,0 +1,328 @@
+import asyncio
+import email.utils
+import heapq
+import itertools
+import random
+import time
+from typing import Any, Callable, Hashable, Iterable, Optional
+
+import aiohttp
+
+
+class HTTPPoolStats:
+    """
+    Counts requests and connection reuse of a ClientSession through aiohttp's tracing hooks.
+    """
+
+    def __init__(self) -> None:
+        self.requests = 0
+        self.failed_requests = 0
+        self.in_flight = 0
+        self.connections_created = 0
+        self.connections_reused = 0
+        self.dns_cache_hits = 0
+        self.dns_cache_misses = 0
+        # Called with the seconds every request took, until its headers were received
+        self.observer: Optional[Callable[[float], None]] = None
+
+    def trace_config(self) -> aiohttp.TraceConfig:
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_request_start.append(self._on_request_start)
+        trace_config.on_request_end.append(self._on_request_end)
+        trace_config.on_request_exception.append(self._on_request_exception)
+        trace_config.on_connection_create_end.append(self._on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(self._on_connection_reuseconn)
+        trace_config.on_dns_cache_hit.append(self._on_dns_cache_hit)
+        trace_config.on_dns_cache_miss.append(self._on_dns_cache_miss)
+        return trace_config
+
+    async def _on_request_start(self, session, context, params) -> None:
+        self.requests += 1
+        self.in_flight += 1
+        context.start = time.perf_counter()
+
+    async def _on_request_end(self, session, context, params) -> None:
+        self.in_flight -= 1
+        self._observe(context)
+
+    async def _on_request_exception(self, session, context, params) -> None:
+        self.in_flight -= 1
+        self.failed_requests += 1
+        self._observe(context)
+
+    def _observe(self, context) -> None:
+        if self.observer is not None:
+            self.observer(time.perf_counter() - context.start)
+
+    async def _on_connection_create_end(self, session, context, params) -> None:
+        self.connections_created += 1
+
+    async def _on_connection_reuseconn(self, session, context, params) -> None:
+        self.connections_reused += 1
+
+    async def _on_dns_cache_hit(self, session, context, params) -> None:
+        self.dns_cache_hits += 1
+
+    async def _on_dns_cache_miss(self, session, context, params) -> None:
+        self.dns_cache_misses += 1
+
+    @property
+    def reuse_ratio(self) -> float:
+        total = self.connections_created + self.connections_reused
+        return self.connections_reused / total if total else 0.0
+
+    def snapshot(self, session: Optional[aiohttp.ClientSession] = None) -> dict:
+        """
+        Returns the counters, plus the open connections of the session's connector if one is given.
+        """
+        stats = {
+            "requests": self.requests,
+            "failed_requests": self.failed_requests,
+            "in_flight": self.in_flight,
+            "connections_created": self.connections_created,
+            "connections_reused": self.connections_reused,
+            "reuse_ratio": self.reuse_ratio,
+            "dns_cache_hits": self.dns_cache_hits,
+            "dns_cache_misses": self.dns_cache_misses,
+        }
+        connector = session.connector if session is not None else None
+        if connector is not None:
+            # aiohttp has no public API for this, fall back to zero if the internals change
+            acquired = len(getattr(connector, "_acquired", ()))
+            idle = sum(len(conns) for conns in getattr(connector, "_conns", {}).values())
+            stats["active_connections"] = acquired
+            stats["idle_connections"] = idle
+            stats["open_connections"] = acquired + idle
+        return stats
+
+
+def create_http_session(
+    stats: Optional[HTTPPoolStats] = None,
+    *,
+    limit: int = 100,
+    limit_per_host: int = 10,
+    dns_cache_ttl: int = 300,
+    keepalive_timeout: float = 30,
+    total_timeout: float = 15,
+    connect_timeout: float = 5,
+) -> aiohttp.ClientSession:
+    """
+    Creates the ClientSession shared by the whole bot.
+
+    :param stats: The stats object to feed through aiohttp's tracing hooks.
+    :param limit: The maximum amount of open connections.
+    :param limit_per_host: The maximum amount of open connections to a single host.
+    :param dns_cache_ttl: How long resolved hostnames are cached, in seconds.
+    :param keepalive_timeout: How long idle connections are kept open, in seconds.
+    :param total_timeout: The default timeout of a whole request, in seconds.
+    :param connect_timeout: The default timeout to open a connection, in seconds.
+    """
+    connector = aiohttp.TCPConnector(
+        limit=limit,
+        limit_per_host=limit_per_host,
+        ttl_dns_cache=dns_cache_ttl,
+        keepalive_timeout=keepalive_timeout,
+    )
+    return aiohttp.ClientSession(
+        connector=connector,
+        timeout=aiohttp.ClientTimeout(total=total_timeout, connect=connect_timeout),
+        trace_configs=[stats.trace_config()] if stats is not None else None,
+    )
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent lookups of the same key, so only one request per key is in flight.
+
+    The first caller to claim a key becomes its owner and must resolve or fail it,
+    every later caller gets the owner's future to wait on.
+    """
+
+    def __init__(self) -> None:
+        self._in_flight: dict[Hashable, asyncio.Future] = {}
+        self.owned = 0
+        self.coalesced = 0
+
+    def claim(self, keys: Iterable[Hashable]) -> tuple[list, dict]:
+        """
+        Claims every key that is not in flight yet.
+
+        :return: The keys now owned by the caller, and a dict of the other keys to the future to wait on.
+        """
+        owned, waiting = [], {}
+        loop = asyncio.get_running_loop()
+        for key in keys:
+            future = self._in_flight.get(key)
+            if future is None:
+                self._in_flight[key] = loop.create_future()
+                owned.append(key)
+                self.owned += 1
+            else:
+                waiting[key] = future
+                self.coalesced += 1
+        return owned, waiting
+
+    def resolve(self, key: Hashable, value: Any) -> None:
+        future = self._in_flight.pop(key, None)
+        if future is not None and not future.done():
+            future.set_result(value)
+
+    def fail(self, keys: Iterable[Hashable], error: BaseException) -> None:
+        for key in keys:
+            future = self._in_flight.pop(key, None)
+            if future is None or future.done():
+                continue
+            if isinstance(error, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(error)
+                # Nobody may be waiting, don't let asyncio log it as never retrieved
+                future.exception()
+
+    @staticmethod
+    async def wait(waiting: dict) -> dict:
+        """
+        Waits for the futures returned by claim(), without cancelling them for other waiters.
+        """
+        return {key: await asyncio.shield(future) for key, future in waiting.items()}
+
+
+class _HostBucket:
+    def __init__(self, rate: float, burst: int) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.waiters: list = []
+        self.dispatcher: Optional[asyncio.Task] = None
+        # Metrics
+        self.acquired = 0
+        self.throttled = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def delay(self) -> float:
+        """
+        Refills the bucket and returns how long to wait before the next token is available.
+        """
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """
+    Per-host token buckets for external APIs, with a priority queue in front of every host.
+
+    Callers wait in the queue until their host has a token left, lower priority values go
+    first, so interactive commands overtake bulk scans. A host answering with 429 can be
+    paused with penalize(), which turns throttling into queue latency instead of errors.
+    """
+
+    INTERACTIVE = 0
+    BULK = 10
+
+    # host -> (requests per second, burst size)
+    DEFAULT_RATES = {
+        "api.steampowered.com": (2.0, 10),
+        "steamhistory.net": (1.0, 5),
+        "open.faceit.com": (5.0, 10),
+    }
+
+    def __init__(self, rates: Optional[dict] = None, default_rate: tuple[float, int] = (10.0, 20)) -> None:
+        self.rates = {**self.DEFAULT_RATES, **(rates or {})}
+        self.default_rate = default_rate
+        self._buckets: dict[str, _HostBucket] = {}
+        self._sequence = itertools.count()
+
+    def _bucket(self, host: str) -> _HostBucket:
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            rate, burst = self.rates.get(host, self.default_rate)
+            bucket = self._buckets[host] = _HostBucket(rate, burst)
+        return bucket
+
+    async def acquire(self, host: str, priority: int = INTERACTIVE) -> float:
+        """
+        Waits for a token of the given host.
+
+        :param host: The host the request will be sent to.
+        :param priority: The priority of the request, lower goes first.
+        :return: How long the caller waited, in seconds.
+        """
+        bucket = self._bucket(host)
+        start = time.monotonic()
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(bucket.waiters, (priority, next(self._sequence), future))
+        if bucket.dispatcher is None or bucket.dispatcher.done():
+            bucket.dispatcher = asyncio.create_task(self._dispatch(bucket))
+        await future
+        waited = time.monotonic() - start
+        bucket.acquired += 1
+        bucket.total_wait += waited
+        bucket.max_wait = max(bucket.max_wait, waited)
+        return waited
+
+    async def _dispatch(self, bucket: _HostBucket) -> None:
+        while bucket.waiters:
+            delay = bucket.delay()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            _, _, future = heapq.heappop(bucket.waiters)
+            if future.done():
+                # The waiter was cancelled, keep the token for the next one
+                continue
+            bucket.tokens -= 1
+            future.set_result(None)
+
+    def penalize(self, host: str, seconds: float) -> None:
+        """
+        Stops handing out tokens for a host for the given amount of seconds, e.g. after a 429.
+        """
+        bucket = self._bucket(host)
+        bucket.throttled += 1
+        bucket.blocked_until = max(bucket.blocked_until, time.monotonic() + seconds)
+
+    def snapshot(self) -> dict:
+        return {
+            host: {
+                "requests": bucket.acquired,
+                "queued": len(bucket.waiters),
+                "throttled": bucket.throttled,
+                "average_wait": bucket.total_wait / bucket.acquired if bucket.acquired else 0.0,
+                "max_wait": bucket.max_wait,
+            }
+            for host, bucket in self._buckets.items()
+        }
+
+
+def backoff_delay(attempt: int, *, base: float = 0.5, cap: float = 30.0) -> float:
+    """
+    Returns the exponential backoff delay of a retry attempt, jittered so retries don't line up.
+    """
+    delay = min(cap, base * 2 ** attempt)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parses a Retry-After header, given either in seconds or as an HTTP date.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
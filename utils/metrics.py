@@ -0,0 +1,193 @@
+"""
+Per-command latency, throughput and error metrics, plus the time commands spend in
+the database and in HTTP requests.
+
+Everything is kept in fixed-bucket histograms, so the memory used does not grow
+with traffic, and can be rendered in the Prometheus text format.
+"""
+
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Optional
+
+# Upper bounds in seconds, shared by every histogram so they can be compared
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "count", "sum")
+
+    def __init__(self, buckets: tuple = DEFAULT_BUCKETS) -> None:
+        self.buckets = buckets
+        # One count per bucket plus the +Inf bucket, not cumulative
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, fraction: float) -> float:
+        """
+        Returns the upper bound of the bucket holding the given quantile, the largest bucket for +Inf.
+        """
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return self.buckets[min(index, len(self.buckets) - 1)]
+        return self.buckets[-1]
+
+    @property
+    def mean(self) -> float:
+        return self.sum / self.count if self.count else 0.0
+
+
+class CommandStats:
+    __slots__ = ("latency", "in_flight", "errors", "db_seconds", "http_seconds")
+
+    def __init__(self) -> None:
+        self.latency = Histogram()
+        self.in_flight = 0
+        # exception type name -> count
+        self.errors: dict[str, int] = {}
+        # Downstream time spent on behalf of this command
+        self.db_seconds = 0.0
+        self.http_seconds = 0.0
+
+
+class Invocation:
+    __slots__ = ("stats", "start", "db_seconds", "http_seconds")
+
+    def __init__(self, stats: CommandStats) -> None:
+        self.stats = stats
+        self.start = time.perf_counter()
+        self.db_seconds = 0.0
+        self.http_seconds = 0.0
+
+
+# The command running in the current task, tasks started by a command inherit it
+_current: ContextVar[Optional[Invocation]] = ContextVar("current_invocation", default=None)
+
+
+class Metrics:
+    def __init__(self) -> None:
+        self.commands: dict[str, CommandStats] = {}
+        self.db = Histogram()
+        self.http = Histogram()
+
+    def command(self, name: str) -> CommandStats:
+        stats = self.commands.get(name)
+        if stats is None:
+            stats = self.commands[name] = CommandStats()
+        return stats
+
+    def start(self, name: str) -> Invocation:
+        """
+        Starts timing a command, DB and HTTP time in the current task is attributed to it from now on.
+        """
+        invocation = Invocation(self.command(name))
+        invocation.stats.in_flight += 1
+        _current.set(invocation)
+        return invocation
+
+    def finish(self, invocation: Invocation) -> None:
+        if _current.get() is invocation:
+            _current.set(None)
+        stats = invocation.stats
+        stats.in_flight -= 1
+        stats.latency.observe(time.perf_counter() - invocation.start)
+        stats.db_seconds += invocation.db_seconds
+        stats.http_seconds += invocation.http_seconds
+
+    def record_error(self, name: str, error: BaseException) -> None:
+        errors = self.command(name).errors
+        error_type = type(error).__name__
+        errors[error_type] = errors.get(error_type, 0) + 1
+
+    def observe_db(self, seconds: float) -> None:
+        self.db.observe(seconds)
+        invocation = _current.get()
+        if invocation is not None:
+            invocation.db_seconds += seconds
+
+    def observe_http(self, seconds: float) -> None:
+        self.http.observe(seconds)
+        invocation = _current.get()
+        if invocation is not None:
+            invocation.http_seconds += seconds
+
+    def render_prometheus(self, prefix: str = "bytebot") -> str:
+        """
+        Renders every metric in the Prometheus text exposition format.
+        """
+        lines = [
+            f"# TYPE {prefix}_command_duration_seconds histogram",
+        ]
+        for name, stats in sorted(self.commands.items()):
+            lines.extend(_render_histogram(f"{prefix}_command_duration_seconds", stats.latency, f'command="{_escape(name)}"'))
+        lines.append(f"# TYPE {prefix}_command_in_flight gauge")
+        lines.extend(
+            f'{prefix}_command_in_flight{{command="{_escape(name)}"}} {stats.in_flight}'
+            for name, stats in sorted(self.commands.items())
+        )
+        lines.append(f"# TYPE {prefix}_command_errors_total counter")
+        for name, stats in sorted(self.commands.items()):
+            lines.extend(
+                f'{prefix}_command_errors_total{{command="{_escape(name)}",error="{_escape(error)}"}} {count}'
+                for error, count in sorted(stats.errors.items())
+            )
+        for downstream in ("db", "http"):
+            lines.append(f"# TYPE {prefix}_command_{downstream}_seconds_total counter")
+            lines.extend(
+                f'{prefix}_command_{downstream}_seconds_total{{command="{_escape(name)}"}} {getattr(stats, f"{downstream}_seconds"):.6f}'
+                for name, stats in sorted(self.commands.items())
+            )
+        lines.append(f"# TYPE {prefix}_db_duration_seconds histogram")
+        lines.extend(_render_histogram(f"{prefix}_db_duration_seconds", self.db))
+        lines.append(f"# TYPE {prefix}_http_duration_seconds histogram")
+        lines.extend(_render_histogram(f"{prefix}_http_duration_seconds", self.http))
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _render_histogram(metric: str, histogram: Histogram, labels: str = "") -> list[str]:
+    separator = "," if labels else ""
+    lines = []
+    cumulative = 0
+    for bound, count in zip(histogram.buckets + ("+Inf",), histogram.counts):
+        cumulative += count
+        lines.append(f'{metric}_bucket{{{labels}{separator}le="{bound}"}} {cumulative}')
+    suffix = f"{{{labels}}}" if labels else ""
+    lines.append(f"{metric}_sum{suffix} {histogram.sum:.6f}")
+    lines.append(f"{metric}_count{suffix} {histogram.count}")
+    return lines
+
+
+async def start_exporter(metrics: Metrics, host: str = "127.0.0.1", port: int = 9108):
+    """
+    Serves the metrics at http://host:port/metrics for a Prometheus scraper.
+
+    :return: The aiohttp AppRunner, call its cleanup() to stop the exporter.
+    """
+    # Only imported when the exporter is enabled
+    from aiohttp import web
+
+    async def handle(request):
+        return web.Response(text=metrics.render_prometheus(), content_type="text/plain", charset="utf-8")
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
@@ -0,0 +1,172 @@
+"""
+Startup helpers: timing the imports of the bot's dependencies, reading the
+commands and dependencies of the cogs without importing them, so cogs can be
+loaded on demand or concurrently, and recording when each cog was loaded.
+"""
+
+import ast
+import importlib.abc
+import os
+import sys
+import time
+from dataclasses import dataclass, field
+from graphlib import CycleError, TopologicalSorter
+from typing import Optional
+
+# Decorators that register a command, the command name defaults to the function name
+COMMAND_DECORATORS = {"command", "hybrid_command", "group", "hybrid_group", "context_menu"}
+
+
+class _TimedLoader(importlib.abc.Loader):
+    """
+    Wraps the loader of a module for a single import, then puts the original loader back.
+    """
+
+    def __init__(self, timer: "ImportTimer", loader) -> None:
+        self.timer = timer
+        self.loader = loader
+
+    def create_module(self, spec):
+        return self.loader.create_module(spec)
+
+    def exec_module(self, module) -> None:
+        module.__loader__ = self.loader
+        module.__spec__.loader = self.loader
+        start = time.perf_counter()
+        try:
+            self.loader.exec_module(module)
+        finally:
+            self.timer.times[module.__name__] = time.perf_counter() - start
+
+
+class ImportTimer(importlib.abc.MetaPathFinder):
+    """
+    Records how long each third-party top-level package takes to import, submodules included.
+
+    Installed at the very top of bot.py and removed once the startup is reported, so
+    later imports pay nothing for it.
+    """
+
+    def __init__(self) -> None:
+        self.times: dict[str, float] = {}
+        self._finding: set[str] = set()
+
+    @classmethod
+    def install(cls) -> "ImportTimer":
+        timer = cls()
+        sys.meta_path.insert(0, timer)
+        return timer
+
+    def uninstall(self) -> None:
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+
+    def find_spec(self, fullname, path, target=None):
+        if "." in fullname or fullname in sys.stdlib_module_names or fullname in self._finding:
+            return None
+        self._finding.add(fullname)
+        try:
+            for finder in sys.meta_path:
+                if finder is self or not hasattr(finder, "find_spec"):
+                    continue
+                spec = finder.find_spec(fullname, path, target)
+                if spec is not None:
+                    break
+            else:
+                return None
+        finally:
+            self._finding.discard(fullname)
+        if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+            spec.loader = _TimedLoader(self, spec.loader)
+        return spec
+
+    def slowest(self, count: int = 10) -> list[tuple[str, float]]:
+        return sorted(self.times.items(), key=lambda item: item[1], reverse=True)[:count]
+
+
+@dataclass
+class CogManifest:
+    # The names the commands of the cog are invoked with, aliases included
+    commands: list[str] = field(default_factory=list)
+    # The extensions that have to be loaded first, from the module level DEPENDENCIES list
+    dependencies: list[str] = field(default_factory=list)
+
+
+@dataclass
+class TimelineEntry:
+    cog: str
+    # Milliseconds since the bot was created
+    start: float
+    end: float
+    status: str
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+def _command_names(function: ast.AST) -> list[str]:
+    names = []
+    for decorator in getattr(function, "decorator_list", []):
+        if not isinstance(decorator, ast.Call):
+            continue
+        func = decorator.func
+        attr = func.attr if isinstance(func, ast.Attribute) else getattr(func, "id", None)
+        if attr not in COMMAND_DECORATORS:
+            continue
+        name: Optional[str] = function.name
+        for keyword in decorator.keywords:
+            if keyword.arg == "name" and isinstance(keyword.value, ast.Constant):
+                name = keyword.value.value
+            elif keyword.arg == "aliases" and isinstance(keyword.value, (ast.List, ast.Tuple)):
+                names.extend(alias.value for alias in keyword.value.elts if isinstance(alias, ast.Constant))
+        names.append(name)
+    return names
+
+
+def _dependencies(tree: ast.Module) -> list[str]:
+    for node in tree.body:
+        if (
+            isinstance(node, ast.Assign)
+            and any(isinstance(target, ast.Name) and target.id == "DEPENDENCIES" for target in node.targets)
+            and isinstance(node.value, (ast.List, ast.Tuple))
+        ):
+            return [item.value for item in node.value.elts if isinstance(item, ast.Constant)]
+    return []
+
+
+def build_cog_manifest(cogs_dir: str) -> dict[str, CogManifest]:
+    """
+    Reads the command names (and aliases) and the dependencies of every cog by parsing its source, without importing it.
+
+    :param cogs_dir: The directory of the cogs.
+    :return: A dict mapping each extension name to its manifest.
+    """
+    manifest = {}
+    for file in sorted(os.listdir(cogs_dir)):
+        if not file.endswith(".py"):
+            continue
+        with open(os.path.join(cogs_dir, file), encoding="utf-8") as source:
+            tree = ast.parse(source.read(), filename=file)
+        cog = CogManifest(dependencies=_dependencies(tree))
+        for node in ast.walk(tree):
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                cog.commands.extend(_command_names(node))
+        manifest[file[:-3]] = cog
+    return manifest
+
+
+def find_dependency_cycles(manifest: dict[str, CogManifest]) -> set[str]:
+    """
+    Returns the extensions that are part of a dependency cycle, they can never be loaded.
+    """
+    graph = {extension: set(cog.dependencies) for extension, cog in manifest.items()}
+    cyclic = set()
+    while True:
+        try:
+            TopologicalSorter(graph).prepare()
+            return cyclic
+        except CycleError as error:
+            cycle = set(error.args[1])
+            cyclic |= cycle
+            graph = {extension: dependencies - cycle for extension, dependencies in graph.items() if extension not in cycle}
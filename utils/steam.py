@@ -0,0 +1,364 @@
+import asyncio
+import json
+import re
+from typing import Optional
+from urllib.parse import quote, urlsplit
+
+import aiohttp
+
+from utils.cache import MISSING, TTLCache
+from utils.http import RateLimiter, SingleFlight, backoff_delay, parse_retry_after
+from utils.tf2_status import STEAMID64_BASE, steamid_to_64
+
+# Steam Web API endpoints
+get_player_summaries = "https://api.steampowered.com/ISteamUser/GetPlayerSummaries/v2/?"
+get_player_bans = "https://api.steampowered.com/ISteamUser/GetPlayerBans/v1/?"
+get_friends_list = "https://api.steampowered.com/ISteamUser/GetFriendList/v1/?"
+convert_to_steamid64 = "https://api.steampowered.com/ISteamUser/ResolveVanityURL/v1/?"
+
+# SteamHistory.net API Setup
+
+# Example Data:
+
+# {
+#  "response": [
+#   {
+#    "SteamID": "7656XXXXXXXXXXXXX",
+#    "Name": "Username",
+#    "CurrentState": "Permanent",
+#    "BanReason": "Hacker",
+#    "UnbanReason": null,
+#    "BanTimestamp": 1685513965,
+#    "UnbanTimestamp": 0,
+#    "Server": "Skial"
+#   }
+#  ]
+# }
+
+get_sourcebans = "https://steamhistory.net/api/sourcebans?key=key&shouldkey=0&steamids={steamids}"
+
+# GetPlayerSummaries accepts at most 100 comma separated SteamIDs per request
+PLAYER_SUMMARIES_BATCH_SIZE = 100
+# How many SteamIDs are sent to SteamHistory in one sourcebans request
+SOURCEBANS_BATCH_SIZE = 100
+# GetPlayerBans accepts at most 100 comma separated SteamIDs per request
+PLAYER_BANS_BATCH_SIZE = 100
+
+
+# ResolveVanityURL resolves a single vanity name per request
+VANITY_BATCH_SIZE = 1
+
+PROFILE_URL_PATTERN = re.compile(
+    r"^(?:https?://)?(?:www\.)?steamcommunity\.com/(profiles|id)/([^/?#\s]+)/?(?:[?#].*)?$", re.IGNORECASE
+)
+VANITY_PATTERN = re.compile(r"^[A-Za-z0-9_-]{2,32}$")
+
+
+def chunked(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def parse_steamid(value: str) -> tuple[Optional[int], Optional[str]]:
+    """
+    Parses a SteamID64, SteamID3, SteamID2, account ID or profile URL without any network access.
+
+    :param value: The user input.
+    :return: A (SteamID64, None) tuple if the input could be resolved locally, (None, vanity name)
+             if it has to be resolved by Steam, or (None, None) if it is not a Steam account at all.
+    """
+    value = value.strip().strip("<>")
+    match = PROFILE_URL_PATTERN.match(value)
+    if match:
+        kind, value = match.groups()
+        if kind.lower() == "id":
+            return None, value.lower() if VANITY_PATTERN.match(value) else None
+        # /profiles/ is always followed by a SteamID64, anything else is not an account
+        if value.isdigit() and STEAMID64_BASE < int(value) < STEAMID64_BASE + 2 ** 32:
+            return int(value), None
+        return None, None
+    steamid64 = steamid_to_64(value)
+    if steamid64 is not None:
+        return steamid64, None
+    if value.isdigit():
+        number = int(value)
+        if STEAMID64_BASE < number < STEAMID64_BASE + 2 ** 32:
+            return number, None
+        if 0 < number < 2 ** 32:
+            # A bare account ID, also known as SteamID32
+            return STEAMID64_BASE + number, None
+        return None, None
+    if VANITY_PATTERN.match(value):
+        # Vanity names are case insensitive, so they are cached in lowercase
+        return None, value.lower()
+    return None, None
+
+
+class SteamCache(TTLCache):
+    """
+    Caches Steam and SteamHistory lookups by (kind, SteamID64 or vanity name), each kind with its own TTL.
+
+    Every write is also remembered as dirty, so the owner of the cache can persist
+    new entries in the background (see take_dirty) and load them back on startup.
+    """
+
+    TTLS = {
+        "summary": 60 * 60,
+        "bans": 30 * 60,
+        "player_bans": 30 * 60,
+        # Negative entries, players that SteamHistory has no bans for
+        "no_bans": 10 * 60,
+        # Vanity names keyed by the lowercase name instead of a SteamID64, they rarely change hands
+        "vanity": 24 * 60 * 60,
+        "no_vanity": 10 * 60,
+    }
+
+    def __init__(self, maxsize: int = 10000, ttls: Optional[dict] = None) -> None:
+        super().__init__(maxsize)
+        self.ttls = {**self.TTLS, **(ttls or {})}
+        self._dirty: set = set()
+
+    def lookup(self, kind: str, steamid64: str):
+        return self.get((kind, steamid64))
+
+    def put(self, kind: str, steamid64: str, value, *, ttl_kind: Optional[str] = None) -> None:
+        key = (kind, steamid64)
+        self.set(key, value, self.ttls[ttl_kind or kind])
+        self._dirty.add(key)
+
+    def load(self, rows) -> None:
+        """
+        Loads persisted (kind, steam_id, payload, expires_at) rows into the cache.
+        """
+        for kind, steam_id, payload, expires_at in rows:
+            if (kind, steam_id) in self._dirty:
+                # Written since the rows were read, so newer than them
+                continue
+            self.set((kind, steam_id), json.loads(payload), 0, expires_at=expires_at)
+
+    def take_dirty(self) -> list:
+        """
+        Returns the entries written since the last call as (kind, steam_id, payload, expires_at) rows.
+        """
+        dirty, self._dirty = self._dirty, set()
+        return [
+            (kind, steam_id, json.dumps(value), expires_at)
+            for (kind, steam_id), value, expires_at in self.items()
+            if (kind, steam_id) in dirty
+        ]
+
+    def clear(self) -> None:
+        super().clear()
+        self._dirty.clear()
+
+    def counts(self) -> dict:
+        counts = {}
+        for (kind, _), _, _ in self.items():
+            counts[kind] = counts.get(kind, 0) + 1
+        return counts
+
+
+class SteamAPI:
+    """
+    Client for the Steam Web API and SteamHistory, running on the bot's shared ClientSession.
+    """
+
+    def __init__(
+        self,
+        session: aiohttp.ClientSession,
+        *,
+        api_key: str = "",
+        player_summaries_url: str = get_player_summaries,
+        player_bans_url: str = get_player_bans,
+        sourcebans_url: str = get_sourcebans,
+        vanity_url: str = convert_to_steamid64,
+        cache: Optional[SteamCache] = None,
+        limiter: Optional[RateLimiter] = None,
+        max_retries: int = 4,
+    ) -> None:
+        self.session = session
+        self.cache = cache if cache is not None else SteamCache()
+        self.flight = SingleFlight()
+        self.limiter = limiter if limiter is not None else RateLimiter()
+        self.max_retries = max_retries
+        self.api_key = api_key
+        self.player_summaries_url = player_summaries_url
+        self.player_bans_url = player_bans_url
+        self.sourcebans_url = sourcebans_url
+        self.vanity_url = vanity_url
+
+    async def _get_json(self, url: str, priority: int = RateLimiter.INTERACTIVE):
+        """
+        GETs a JSON document through the rate limiter, retrying throttled and failed requests.
+
+        A 429 pauses the whole host for its Retry-After (or a backoff delay), server errors and
+        connection errors are retried after a jittered exponential backoff.
+        """
+        host = urlsplit(url).hostname
+        for attempt in range(self.max_retries + 1):
+            await self.limiter.acquire(host, priority)
+            retry_in = None
+            try:
+                async with self.session.get(url) as response:
+                    if attempt < self.max_retries:
+                        if response.status == 429:
+                            self.limiter.penalize(
+                                host, parse_retry_after(response.headers.get("Retry-After")) or backoff_delay(attempt)
+                            )
+                            continue
+                        if response.status >= 500:
+                            retry_in = backoff_delay(attempt)
+                    if retry_in is None:
+                        response.raise_for_status()
+                        return await response.json()
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if attempt >= self.max_retries:
+                    raise
+                retry_in = backoff_delay(attempt)
+            await asyncio.sleep(retry_in)
+
+    async def _lookup(self, kind: str, steamids64, batch_size: int, fetch_batch, *, fresh: bool = False) -> dict:
+        """
+        Resolves lookups of one kind from the cache first, then from identical requests
+        already in flight, and only fetches what is left, in batches.
+
+        :param fetch_batch: A coroutine function taking a list of SteamID64s and returning a dict of their values.
+        :param fresh: Skip the cache and always go upstream, the results are still cached.
+        :return: A dict mapping each SteamID64 (as a string) to its value, None if nothing was found.
+        """
+        results = {}
+        missing = []
+        for steamid64 in dict.fromkeys(str(steamid64) for steamid64 in steamids64):
+            cached = MISSING if fresh else self.cache.lookup(kind, steamid64)
+            if cached is MISSING:
+                missing.append(steamid64)
+            else:
+                results[steamid64] = cached
+        owned, waiting = self.flight.claim((kind, steamid64) for steamid64 in missing)
+        owned = [steamid64 for _, steamid64 in owned]
+        resolved = set()
+        try:
+            for batch in chunked(owned, batch_size):
+                fetched = await fetch_batch(batch)
+                for steamid64 in batch:
+                    results[steamid64] = fetched.get(steamid64)
+                    self.flight.resolve((kind, steamid64), results[steamid64])
+                    resolved.add(steamid64)
+        except BaseException as error:
+            self.flight.fail(((kind, steamid64) for steamid64 in owned if steamid64 not in resolved), error)
+            raise
+        for (_, steamid64), value in (await self.flight.wait(waiting)).items():
+            results[steamid64] = value
+        return results
+
+    async def fetch_player_summaries(self, steamids64, priority: int = RateLimiter.INTERACTIVE) -> dict:
+        """
+        Fetches the Steam profiles of any number of players, 100 per request.
+
+        :param steamids64: The SteamID64s to look up.
+        :param priority: The rate limiter priority of the requests.
+        :return: A dict mapping each SteamID64 (as a string) to its player summary.
+        """
+        async def fetch_batch(batch):
+            data = await self._get_json(
+                self.player_summaries_url + f"key={self.api_key}&steamids={','.join(batch)}", priority
+            )
+            profiles = {}
+            for player in data.get('response', {}).get('players', []):
+                profiles[player['steamid']] = player
+                self.cache.put("summary", player['steamid'], player)
+            return profiles
+
+        profiles = await self._lookup("summary", steamids64, PLAYER_SUMMARIES_BATCH_SIZE, fetch_batch)
+        return {steamid64: profile for steamid64, profile in profiles.items() if profile is not None}
+
+    async def resolve_steamid(self, value: str, priority: int = RateLimiter.INTERACTIVE) -> Optional[int]:
+        """
+        Resolves any kind of SteamID or profile URL to a SteamID64, asking Steam only for vanity names.
+
+        :param value: The user input.
+        :param priority: The rate limiter priority of the request.
+        :return: The SteamID64, or None if the input is invalid or no profile has that vanity name.
+        """
+        steamid64, vanity = parse_steamid(value)
+        if vanity is None:
+            return steamid64
+
+        async def fetch_batch(batch):
+            resolved = {}
+            for name in batch:
+                data = await self._get_json(
+                    self.vanity_url + f"key={self.api_key}&vanityurl={quote(name)}", priority
+                )
+                response = data.get('response', {})
+                # 1 is a match, 42 means no profile uses that name
+                if response.get('success') == 1:
+                    resolved[name] = int(response['steamid'])
+                    self.cache.put("vanity", name, resolved[name])
+                else:
+                    self.cache.put("vanity", name, None, ttl_kind="no_vanity")
+            return resolved
+
+        resolved = await self._lookup("vanity", [vanity], VANITY_BATCH_SIZE, fetch_batch)
+        return resolved.get(vanity)
+
+    async def get_steam_profile_name(self, steamid64) -> str:
+        profiles = await self.fetch_player_summaries([steamid64])
+        profile = profiles.get(str(steamid64))
+        if profile:
+            return profile['personaname']
+        return "Unknown Player"  # Or handle this case as you see fit
+
+    async def fetch_sourcebans(
+        self,
+        steamids64,
+        batch_size: int = SOURCEBANS_BATCH_SIZE,
+        priority: int = RateLimiter.INTERACTIVE,
+        *,
+        fresh: bool = False,
+    ) -> dict:
+        """
+        Fetches the SourceBans records of any number of players from SteamHistory,
+        sending up to `batch_size` SteamIDs per request.
+
+        :param steamids64: The SteamID64s to look up.
+        :param batch_size: The maximum amount of SteamIDs per request.
+        :param priority: The rate limiter priority of the requests.
+        :param fresh: Skip the cache and always ask SteamHistory.
+        :return: A dict mapping each SteamID64 (as a string) to its list of bans. Players without bans are left out.
+        """
+        async def fetch_batch(batch):
+            data = await self._get_json(self.sourcebans_url.format(steamids=",".join(batch)), priority)
+            fetched = {steamid64: [] for steamid64 in batch}
+            for ban in data.get('response') or []:
+                fetched.setdefault(str(ban['SteamID']), []).append(ban)
+            for steamid64, player_bans in fetched.items():
+                self.cache.put("bans", steamid64, player_bans, ttl_kind="bans" if player_bans else "no_bans")
+            return fetched
+
+        bans = await self._lookup("bans", steamids64, batch_size, fetch_batch, fresh=fresh)
+        return {steamid64: player_bans for steamid64, player_bans in bans.items() if player_bans}
+
+    async def fetch_player_bans(
+        self, steamids64, priority: int = RateLimiter.INTERACTIVE, *, fresh: bool = False
+    ) -> dict:
+        """
+        Fetches the VAC, game, community and trade ban status of any number of players, 100 per request.
+
+        :param steamids64: The SteamID64s to look up.
+        :param priority: The rate limiter priority of the requests.
+        :param fresh: Skip the cache and always ask Steam.
+        :return: A dict mapping each SteamID64 (as a string) to its GetPlayerBans record.
+        """
+        async def fetch_batch(batch):
+            data = await self._get_json(
+                self.player_bans_url + f"key={self.api_key}&steamids={','.join(batch)}", priority
+            )
+            records = {}
+            for player in data.get('players', []):
+                records[player['SteamId']] = player
+                self.cache.put("player_bans", player['SteamId'], player)
+            return records
+
+        records = await self._lookup("player_bans", steamids64, PLAYER_BANS_BATCH_SIZE, fetch_batch, fresh=fresh)
+        return {steamid64: record for steamid64, record in records.items() if record is not None}
@@ -0,0 +1,142 @@
+"""
+Parser for the output of the TF2 `status` console command.
+
+The parser does no I/O, so it can be used and timed on its own, away from the
+network lookups that enrich its result.
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import Optional
+
+# SteamID64 of the individual account with account ID 0
+STEAMID64_BASE = 76561197960265728
+
+STEAMID3_PATTERN = re.compile(r"^\[U:1:(\d+)\]$")
+STEAMID2_PATTERN = re.compile(r"^STEAM_[0-5]:([01]):(\d+)$")
+
+HEADER_PATTERN = re.compile(r"^(hostname|map|tags|players)\s*:\s*(.*)$")
+PLAYERS_PATTERN = re.compile(
+    r"^(\d+)\s+humans?(?:,\s*(\d+)\s+bots?)?\s*\((\d+)\s+max\)|^(\d+)\s*\((\d+)\s+max\)"
+)
+PLAYER_PATTERN = re.compile(
+    r"^#\s*(\d+)\s+(?:\d+\s+)?\"(.*)\"\s+(\[U:1:\d+\]|STEAM_[0-5]:[01]:\d+|BOT)"
+    r"(?:\s+(\d+(?::\d+){1,2})\s+(\d+)\s+(\d+))?\s+(\w+)"
+)
+
+
+def steamid_to_64(steamid: str) -> Optional[int]:
+    """
+    Converts a SteamID3 (`[U:1:x]`) or a SteamID2 (`STEAM_0:y:z`) to a SteamID64.
+
+    :param steamid: The SteamID to convert.
+    :return: The SteamID64, or None if the ID is in neither format.
+    """
+    match = STEAMID3_PATTERN.match(steamid)
+    if match:
+        return STEAMID64_BASE + int(match.group(1))
+    match = STEAMID2_PATTERN.match(steamid)
+    if match:
+        return STEAMID64_BASE + int(match.group(2)) * 2 + int(match.group(1))
+    return None
+
+
+def parse_duration(value: str) -> int:
+    """
+    Converts a `[h:]mm:ss` connection time into seconds.
+    """
+    seconds = 0
+    for part in value.split(":"):
+        seconds = seconds * 60 + int(part)
+    return seconds
+
+
+@dataclass
+class StatusPlayer:
+    userid: int
+    name: str
+    steamid: Optional[str]
+    steamid64: Optional[int]
+    connected: Optional[int]
+    ping: Optional[int]
+    loss: Optional[int]
+    state: str
+
+    @property
+    def is_bot(self) -> bool:
+        return self.steamid is None
+
+
+@dataclass
+class StatusResult:
+    hostname: str = ""
+    map_name: str = ""
+    tags: list[str] = field(default_factory=list)
+    humans: int = 0
+    bots: int = 0
+    max_players: int = 0
+    players: list[StatusPlayer] = field(default_factory=list)
+
+    @property
+    def valve_official(self) -> bool:
+        return "valve" in self.tags
+
+    @property
+    def steamids(self) -> list[str]:
+        return [player.steamid for player in self.players if player.steamid is not None]
+
+    @property
+    def steamids64(self) -> list[int]:
+        return [player.steamid64 for player in self.players if player.steamid64 is not None]
+
+
+def parse_status(status: str) -> StatusResult:
+    """
+    Parses the output of the `status` command in a single pass.
+
+    :param status: The full output of the command.
+    :return: The server info and every player listed in the output.
+    """
+    result = StatusResult()
+    for line in status.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if line[0] == "#":
+            match = PLAYER_PATTERN.match(line)
+            if match is None:
+                # The column header, or a line we don't understand
+                continue
+            userid, name, uniqueid, connected, ping, loss, state = match.groups()
+            steamid = None if uniqueid == "BOT" else uniqueid
+            result.players.append(
+                StatusPlayer(
+                    userid=int(userid),
+                    name=name,
+                    steamid=steamid,
+                    steamid64=steamid_to_64(steamid) if steamid else None,
+                    connected=parse_duration(connected) if connected else None,
+                    ping=int(ping) if ping else None,
+                    loss=int(loss) if loss else None,
+                    state=state,
+                )
+            )
+            continue
+        match = HEADER_PATTERN.match(line)
+        if match is None:
+            continue
+        key, value = match.groups()
+        if key == "hostname":
+            result.hostname = value.strip()
+        elif key == "map":
+            result.map_name = value.split(maxsplit=1)[0] if value else ""
+        elif key == "tags":
+            result.tags = [tag for tag in value.strip().split(",") if tag]
+        elif key == "players":
+            players = PLAYERS_PATTERN.match(value.strip())
+            if players is not None:
+                humans, bots, max_players, total, total_max = players.groups()
+                result.humans = int(humans or total)
+                result.bots = int(bots or 0)
+                result.max_players = int(max_players or total_max)
+    return result
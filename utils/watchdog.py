@@ -0,0 +1,125 @@
+"""
+Event loop lag monitor.
+
+A task measures how late the loop wakes it up, which is how long callbacks were
+kept waiting. A thread watches the task's heartbeat, and when the loop has not
+come back for longer than the threshold, it captures the stack of the event loop
+thread, which points at the blocking call while it is still running.
+"""
+
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from dataclasses import dataclass
+from typing import Optional
+
+from utils.metrics import Histogram
+
+logger = logging.getLogger("discord_bot.watchdog")
+
+# Upper bounds in seconds, finer than the command buckets since most lag is well under 10ms
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+@dataclass
+class Stall:
+    # Wall clock time the stall was caught at
+    detected_at: float
+    # How long the loop had been blocked when its stack was captured
+    blocked_for: float
+    task: str
+    stack: str
+
+
+class LoopWatchdog:
+    def __init__(
+        self,
+        *,
+        interval: float = 0.1,
+        threshold: float = 0.25,
+        window: int = 3000,
+        keep_stalls: int = 10,
+    ) -> None:
+        self.interval = interval
+        self.threshold = threshold
+        self.lag = Histogram(LAG_BUCKETS)
+        # The most recent samples, for exact percentiles
+        self.samples: deque[float] = deque(maxlen=window)
+        self.max_lag = 0.0
+        self.stalls: deque[Stall] = deque(maxlen=keep_stalls)
+        self.heartbeat = time.monotonic()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def start(self) -> None:
+        """
+        Starts the lag task on the running loop and the watching thread.
+        """
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self.heartbeat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.create_task(self._measure(), name="loop-watchdog")
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+
+    async def _measure(self) -> None:
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self.heartbeat = now
+            lag = max(0.0, now - expected)
+            self.lag.observe(lag)
+            self.samples.append(lag)
+            if lag > self.max_lag:
+                self.max_lag = lag
+            if lag >= self.threshold:
+                logger.warning(f"Event loop was blocked for {lag * 1000:.0f}ms")
+
+    def _watch(self) -> None:
+        captured_beat = None
+        while not self._stopped.wait(self.threshold / 2):
+            beat = self.heartbeat
+            blocked_for = time.monotonic() - beat - self.interval
+            # One capture per stall, the first one is closest to where it started blocking
+            if blocked_for < self.threshold or beat == captured_beat:
+                continue
+            captured_beat = beat
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            stack = "".join(traceback.format_stack(frame))
+            task = asyncio.current_task(self._loop) if self._loop is not None else None
+            stall = Stall(
+                detected_at=time.time(),
+                blocked_for=blocked_for,
+                task=task.get_name() if task is not None else "no task (loop callback)",
+                stack=stack,
+            )
+            self.stalls.append(stall)
+            logger.warning(
+                f"Event loop blocked for over {blocked_for * 1000:.0f}ms in {stall.task}, stack of the loop thread:\n{stack}"
+            )
+
+    def percentile(self, fraction: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    @property
+    def over_threshold(self) -> int:
+        return sum(1 for lag in self.samples if lag >= self.threshold)